@@ -0,0 +1,18 @@
+"""
+Compact JSON encoding and decoding, using orjson when it is installed.
+"""
+
+import functools
+import json
+from typing import Any
+
+try:
+    import orjson
+    loads = orjson.loads
+
+    def dumps(obj: Any) -> str:
+        """Serialize compact JSON with orjson."""
+        return orjson.dumps(obj).decode()
+except ImportError:
+    loads = json.loads
+    dumps = functools.partial(json.dumps, separators=(",", ":"))
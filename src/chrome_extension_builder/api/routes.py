@@ -3,9 +3,10 @@ API routes for Chrome Extension Builder.
 """
 
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
 from ..models.extension import Extension, ExtensionManifest
@@ -86,7 +87,7 @@ async def update_extension(extension_id: str, request: ExtensionUpdateRequest):
     if request.files:
         extension.files.update(request.files)
     
-    extension.updated_at = datetime.utcnow()
+    extension.updated_at = datetime.now(timezone.utc)
     return extension
 
 
@@ -99,11 +100,25 @@ async def upload_extension_file(extension_id: str, file: UploadFile = File(...))
     extension = extensions[extension_id]
     content = await file.read()
     extension.files[file.filename] = content.decode('utf-8')
-    extension.updated_at = datetime.utcnow()
+    extension.updated_at = datetime.now(timezone.utc)
     
     return {"message": f"File {file.filename} uploaded successfully"}
 
 
+@router.get("/extensions/{extension_id}/files/{name:path}")
+async def get_extension_file(extension_id: str, name: str):
+    """Get the contents of a single extension file."""
+    if extension_id not in extensions:
+        raise HTTPException(status_code=404, detail="Extension not found")
+    
+    extension = extensions[extension_id]
+    if name not in extension.files:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    # Serve the stored contents, which match the manifest hashes, not the mutable working copy on disk
+    return PlainTextResponse(extension.files[name])
+
+
 @router.post("/browser/sessions", response_model=BrowserSession)
 async def create_browser_session(extension_id: str):
     """Create a new browser session for testing an extension."""
@@ -139,7 +154,7 @@ async def load_extension_in_browser(session_id: str):
     
     # TODO: Implement actual browser automation
     session.status = "loaded"
-    session.updated_at = datetime.utcnow()
+    session.updated_at = datetime.now(timezone.utc)
     
     return {"message": f"Extension {extension.name} loaded in browser"}
 
@@ -327,7 +342,7 @@ async def get_debug_logs(session_id: str):
         return {
             "status": "success",
             "session_id": session_id,
-            "logs": logs.dict()
+            "logs": logs.model_dump()
         }
         
     except Exception as e:
@@ -4,7 +4,7 @@ Browser event logging service for debugging extensions.
 
 import json
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Callable
 from playwright.async_api import Page, BrowserContext
@@ -111,7 +111,7 @@ class BrowserEventLogger:
         """Set up console log capture."""
         
         async def handle_console(msg):
-            log_entry = f"[{datetime.now().isoformat()}] {msg.type}: {msg.text}"
+            log_entry = f"[{datetime.now(timezone.utc).isoformat()}] {msg.type}: {msg.text}"
             self.console_logs.append(log_entry)
             
             # Log as event
@@ -189,9 +189,9 @@ class BrowserEventLogger:
         log_data = {
             "session_id": self.session_id,
             "extension_id": self.extension_id,
-            "timestamp": datetime.now().isoformat(),
-            "events": [event.dict() for event in self.events],
-            "errors": [error.dict() for error in self.errors],
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "events": [event.model_dump() for event in self.events],
+            "errors": [error.model_dump() for error in self.errors],
             "console_logs": self.console_logs,
             "summary": {
                 "total_events": len(self.events),
@@ -295,7 +295,7 @@ class DebugSessionManager:
             if session_id in self.debug_sessions:
                 debug_session = self.debug_sessions[session_id]
                 debug_session.is_active = False
-                debug_session.updated_at = datetime.utcnow()
+                debug_session.updated_at = datetime.now(timezone.utc)
                 debug_session.events_count = len(logger.events)
                 debug_session.errors_count = len(logger.errors)
             
@@ -10,7 +10,7 @@ import shutil
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 from playwright.async_api import async_playwright, Browser, Page
-from datetime import datetime
+from datetime import datetime, timezone
 
 from ..models.extension import Extension
 from ..models.browser import BrowserSession, DebugSession, LogAnalysis
@@ -98,7 +98,7 @@ class BrowserManager:
             
             # Write manifest.json
             manifest_path = extension_dir / "manifest.json"
-            manifest_data = extension.manifest.dict() if extension.manifest else {
+            manifest_data = extension.manifest.model_dump() if extension.manifest else {
                 "name": extension.name,
                 "version": "1.0.0",
                 "description": extension.description,
@@ -196,7 +196,7 @@ class BrowserManager:
             
             # Write manifest.json
             manifest_path = extension_dir / "manifest.json"
-            manifest_data = extension.manifest.dict() if extension.manifest else {
+            manifest_data = extension.manifest.model_dump() if extension.manifest else {
                 "name": extension.name,
                 "version": "1.0.0",
                 "description": extension.description,
@@ -287,7 +287,7 @@ class BrowserManager:
             
             # 6. Start debug session if enabled
             if enable_debug and self.extension_id:
-                session_id = f"debug_{extension.id}_{int(datetime.now().timestamp())}"
+                session_id = f"debug_{extension.id}_{int(datetime.now(timezone.utc).timestamp())}"
                 self.current_debug_session = await self.debug_manager.start_debug_session(
                     session_id, extension.id, self.page, self.context
                 )
@@ -467,7 +467,7 @@ class BrowserManager:
         session = self.sessions.get(session_id)
         if session:
             session.url = url
-            session.updated_at = datetime.utcnow()
+            session.updated_at = datetime.now(timezone.utc)
     
     async def get_console_logs(self, session_id: str) -> List[Dict[str, Any]]:
         """Get console logs from the browser."""
@@ -2,23 +2,89 @@
 Chat agent that manages conversations and integrates with Pydantic AI for function calling.
 """
 
+import asyncio
+import hashlib
+import logging
 import os
-from typing import Dict, List, Optional, Any
+import re
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Any, Tuple
+import httpx
 from pydantic_ai import Agent
 from pydantic_ai.models.gemini import GeminiModel
+from pydantic_ai.providers.google_gla import GoogleGLAProvider
 from pydantic_ai.tools import Tool
 
+from ..api.routes import extensions
 from ..models.chat import ChatMessage, MessageRole
-from .function_caller import FunctionCaller
+from .function_caller import FunctionCaller, BUILD_MESSAGE_PREFIX, FIX_MESSAGE_PREFIX, IMPROVE_MESSAGE_PREFIX, ROLE_PREFIX
 from .function_executor import FunctionExecutor
 from .cli_handler import CLIHandler
 from .debug_handler import DebugHandler
-from .output_models import ExtensionResponse, QuestionResponse, DebugAnalysisResponse, ConversationResponse
+from .intent_cache import IntentCache
+from .session_store import MAX_SESSIONS
+from .output_models import ExtensionResponse, QuestionResponse, DebugAnalysisResponse, ConversationResponse, IntentAnalysis
 
+logger = logging.getLogger(__name__)
+
+# Seconds an idle Gemini connection stays open between chat turns (httpx default is 5)
+KEEPALIVE_SECONDS = 300
+
+# Static instructions for intent analysis, sent as the system prompt so the
+# identical prefix can be reused by Gemini's prompt caching across turns
+INTENT_PROMPT_PREFIX = """
+Classify the user's message into one action, using the conversation context:
+build_extension: create a new extension
+improve_extension: add/enhance features ("add", "also", "can we")
+fix_extension: reported bugs ("fix", "broken", "not working")
+debug_analysis: questions about errors, logs or debugging
+clarification_needed: wants to build but gives too few details
+general_conversation: anything else
+"""
+
+# Per-turn part of the intent prompt, filled in after the static system prompt
+_INTENT_PROMPT_TMPL = """
+**Conversation Context:**
+{recent_context}
+
+**User's Message:**
+{user_message}
+"""
+
+# Actions that generate code and use the prewarmed session resources
+GENERATION_ACTIONS = {"build_extension", "improve_extension", "fix_extension"}
+
+# Optional lead-in words before an imperative command ("please add ...", "ok, fix ...")
+_IMPERATIVE = r"^\s*(?:(?:please|ok(?:ay)?|now|also)[,\s]+)*"
+
+# Keyword rules for unambiguous intents, checked before asking the LLM; commands must
+# start the message so questions that merely mention a keyword are left to the LLM
+INTENT_PATTERNS = {
+    "build_extension": _IMPERATIVE + r"(?:create|build|make)\b",
+    "improve_extension": _IMPERATIVE + r"(?:add|enhance|improve)\b",
+    "fix_extension": (
+        _IMPERATIVE + r"fix\b"
+        r"|\b(?:is|are|it'?s)\s+(?:broken|not working)\b"
+        r"|\b(?:doesn'?t|does not|isn'?t|is not)\s+work"
+    ),
+    "debug_analysis": _IMPERATIVE + r"(?:debug|analy[sz]e|check)\s+(?:the\s+)?(?:logs?|console|errors?)\b",
+}
+# All rules in one alternation so each message is scanned once
+_INTENT_RE = re.compile(
+    "|".join(f"(?P<{action}>{pattern})" for action, pattern in INTENT_PATTERNS.items()), re.I
+)
+
+# Keyword intents at or above this confidence skip the LLM; questions score below it
+INTENT_CONFIDENCE_THRESHOLD = 0.8
+KEYWORD_CONFIDENCE = 0.9
+KEYWORD_QUESTION_CONFIDENCE = 0.6
 
 class ChatAgent:
     """Manages chat conversations and integrates with Pydantic AI for function calling."""
     
+    # Tools shared by every instance, built on first construction
+    _TOOLS = None
+    
     def __init__(self, api_key: Optional[str] = None):
         """Initialize the chat agent."""
         # Try to get API key from parameter, then environment variables
@@ -30,84 +96,97 @@ class ChatAgent:
                 "in your .env file or pass it as a parameter."
             )
         
-        # Create Pydantic AI agent with Gemini model
-        self.model = GeminiModel('gemini-2.0-flash', provider='google-gla')
+        # Create Pydantic AI agent with Gemini model, sharing one keep-alive
+        # connection pool across turns so follow-ups skip the TCP/TLS handshake
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(600, connect=5),
+            limits=httpx.Limits(keepalive_expiry=KEEPALIVE_SECONDS)
+        )
+        provider = GoogleGLAProvider(api_key=self.api_key, http_client=http_client)
+        self.model = GeminiModel('gemini-2.0-flash', provider=provider)
         
         # Initialize modular components first
         self.function_caller = FunctionCaller()
-        self.cli_handler = CLIHandler(self.model, None)  # Will set websocket later
-        self.function_executor = FunctionExecutor(self.model, None, self.cli_handler)
-        self.debug_handler = DebugHandler(self.model, None)
+        # Streaming goes to the session's own WebSockets via session_store, never a shared socket
+        self.cli_handler = CLIHandler(self.model)
+        self.function_executor = FunctionExecutor(self.model, self.cli_handler)
+        self.debug_handler = DebugHandler(self.model)
+        self._intent_cache = IntentCache()
+        self._intent_inflight: Dict[str, asyncio.Task] = {}
+        # Per-session rolling window of formatted context lines and the number of messages consumed,
+        # bounded like the session store so windows of evicted sessions do not accumulate
+        self._context_windows: "OrderedDict[str, Tuple[Deque[str], int]]" = OrderedDict()
         
-        # Create tools with proper decorators
-        build_tool = Tool(
-            self._build_extension_tool,
-            name="build_extension",
-            description="Create a new Chrome extension from scratch based on user requirements"
-        )
-        
-        fix_tool = Tool(
-            self._fix_extension_tool,
-            name="fix_extension", 
-            description="Fix issues or bugs in an existing Chrome extension"
-        )
-        
-        improve_tool = Tool(
-            self._improve_extension_tool,
-            name="improve_extension",
-            description="Enhance or improve an existing Chrome extension with new features or optimizations"
-        )
-        
-        answer_tool = Tool(
-            self._answer_user_question_tool,
-            name="answer_user_question",
-            description="Answer general questions about Chrome extensions, development, or provide guidance"
-        )
+        # Create tools once per process; the tool functions do not depend on the instance
+        if ChatAgent._TOOLS is None:
+            ChatAgent._TOOLS = [
+                Tool(
+                    ChatAgent._build_extension_tool,
+                    name="build_extension",
+                    description="Create a new Chrome extension from scratch based on user requirements"
+                ),
+                Tool(
+                    ChatAgent._fix_extension_tool,
+                    name="fix_extension",
+                    description="Fix issues or bugs in an existing Chrome extension"
+                ),
+                Tool(
+                    ChatAgent._improve_extension_tool,
+                    name="improve_extension",
+                    description="Enhance or improve an existing Chrome extension with new features or optimizations"
+                ),
+                Tool(
+                    ChatAgent._answer_user_question_tool,
+                    name="answer_user_question",
+                    description="Answer general questions about Chrome extensions, development, or provide guidance"
+                ),
+            ]
         
         # Create agent with tools
-        self.agent = Agent(
-            self.model,
-            tools=[build_tool, fix_tool, improve_tool, answer_tool]
-        )
+        self.agent = Agent(self.model, tools=ChatAgent._TOOLS)
         
-        # WebSocket for streaming (will be set by routes)
-        self.websocket = None
+        # Tool-less agent reused for every intent analysis
+        self._intent_agent = Agent(self.model, output_type=IntentAnalysis, system_prompt=INTENT_PROMPT_PREFIX)
         
-        print(f"ChatAgent initialized with API key: {self.api_key[:10]}...")
+        logger.info("ChatAgent initialized")
     
-    def _build_extension_tool(self, requirements: str, features: List[str] = None, target_websites: List[str] = None) -> ExtensionResponse:
+    @staticmethod
+    def _build_extension_tool(requirements: str, features: List[str] = None, target_websites: List[str] = None) -> ExtensionResponse:
         """Create a new Chrome extension from scratch based on user requirements."""
         # This will be called by the agent when it decides to build an extension
         return ExtensionResponse(
             success=True,
-            message=f"Building extension with requirements: {requirements}",
+            message=BUILD_MESSAGE_PREFIX + requirements,
             action_type="build",
             extension_name="New Chrome Extension",
             extension_description="A Chrome extension based on your requirements",
             files_created=["manifest.json", "popup.html", "popup.js"]
         )
     
-    def _fix_extension_tool(self, issues: str, error_logs: str = "", current_behavior: str = "") -> ExtensionResponse:
+    @staticmethod
+    def _fix_extension_tool(issues: str, error_logs: str = "", current_behavior: str = "") -> ExtensionResponse:
         """Fix issues or bugs in an existing Chrome extension."""
         return ExtensionResponse(
             success=True,
-            message=f"Fixing extension issues: {issues}",
+            message=FIX_MESSAGE_PREFIX + issues,
             action_type="fix",
             extension_name="Fixed Chrome Extension",
             extension_description="A Chrome extension with fixes applied"
         )
     
-    def _improve_extension_tool(self, improvements: str, current_features: str = "", performance_issues: str = "") -> ExtensionResponse:
+    @staticmethod
+    def _improve_extension_tool(improvements: str, current_features: str = "", performance_issues: str = "") -> ExtensionResponse:
         """Enhance or improve an existing Chrome extension with new features or optimizations."""
         return ExtensionResponse(
             success=True,
-            message=f"Improving extension with: {improvements}",
+            message=IMPROVE_MESSAGE_PREFIX + improvements,
             action_type="improve",
             extension_name="Improved Chrome Extension",
             extension_description="A Chrome extension with improvements applied"
         )
     
-    def _answer_user_question_tool(self, question: str, topic: str = "chrome extension development") -> QuestionResponse:
+    @staticmethod
+    def _answer_user_question_tool(question: str, topic: str = "chrome extension development") -> QuestionResponse:
         """Answer general questions about Chrome extensions, development, or provide guidance."""
         return QuestionResponse(
             answer=f"Answering question about {topic}: {question}",
@@ -116,111 +195,137 @@ class ChatAgent:
             next_steps=["Review the documentation", "Try the example code"]
         )
     
-    async def _analyze_user_intent(self, user_message: str, messages: List[ChatMessage]) -> Dict[str, Any]:
+    def _recent_context(self, messages: List[ChatMessage], session_id: str = None) -> str:
+        """Format the 3 messages before the newest, extending the session's rolling window with only unseen messages."""
+        end = len(messages) - 1
+        window, consumed = self._context_windows.get(session_id, (deque(maxlen=3), 0))
+        if session_id is None or consumed > end:
+            window, consumed = deque(maxlen=3), 0
+        window.extend(
+            ROLE_PREFIX[msg.role] + msg.content
+            for msg in messages[max(consumed, end - 3):end]
+        )
+        if session_id is not None:
+            self._context_windows[session_id] = (window, end)
+            self._context_windows.move_to_end(session_id)
+            while len(self._context_windows) > MAX_SESSIONS:
+                self._context_windows.popitem(last=False)
+        return "\n".join(window)
+    
+    @staticmethod
+    def _keyword_intent(user_message: str) -> Optional[Dict[str, Any]]:
+        """Classify a message by keyword rules, or return None when no single rule applies."""
+        matches = {match.lastgroup for match in _INTENT_RE.finditer(user_message)}
+        # Build requests still go to the LLM, which decides whether clarification is needed
+        if len(matches) != 1 or "build_extension" in matches:
+            return None
+        is_question = user_message.rstrip().endswith("?")
+        return {
+            "action": matches.pop(),
+            "confidence": KEYWORD_QUESTION_CONFIDENCE if is_question else KEYWORD_CONFIDENCE,
+            "reasoning": "keyword match",
+            "needs_clarification": False
+        }
+    
+    async def _analyze_user_intent(self, user_message: str, messages: List[ChatMessage], session_id: str = None) -> Dict[str, Any]:
         """Use LLM to intelligently analyze user intent and determine the appropriate action."""
-        # Create context from recent messages
-        recent_context = "\n".join([
-            f"{'User' if msg.role == MessageRole.USER else 'Assistant'}: {msg.content}"
-            for msg in messages[-3:]  # Last 3 messages for context
-        ])
+        # Clear commands about the session's existing extension skip the LLM entirely
+        # (chat-generated extensions are stored under the session ID)
+        if session_id is not None and session_id in extensions:
+            intent_data = self._keyword_intent(user_message)
+            if intent_data is not None and intent_data["confidence"] >= INTENT_CONFIDENCE_THRESHOLD:
+                logger.debug("🧠 Intent Analysis (keyword): %s", intent_data)
+                return intent_data
         
-        intent_prompt = f"""
-Analyze the user's intent and determine the appropriate action. Consider the conversation context and the user's message.
-
-**Conversation Context:**
-{recent_context}
-
-**User's Message:**
-{user_message}
-
-**Available Actions:**
-1. **build_extension** - User wants to create a new Chrome extension from scratch
-2. **improve_extension** - User wants to add features or enhance an existing extension
-3. **fix_extension** - User reports issues or bugs that need fixing
-4. **debug_analysis** - User is asking about debugging, errors, or logs
-5. **clarification_needed** - User wants to build something but needs more details
-6. **general_conversation** - General chat or questions about Chrome extensions
-
-**Analysis Guidelines:**
-- If user wants to create something new, it's likely build_extension
-- If user mentions "add", "enhance", "improve", "also", "can we", it's likely improve_extension
-- If user mentions "fix", "broken", "not working", "error", it's likely fix_extension
-- If user mentions "debug", "error", "log", "bug", it's likely debug_analysis
-- If user wants to build but lacks specific details, suggest clarification_needed
-- Otherwise, it's general_conversation
-
-**Important Notes:**
-- Custom icons will be automatically copied from the template
-- Gemini CLI should NOT generate any PNG image files
-- Focus on functionality and code generation
-
-**Response Format:**
-Return a JSON object with:
-- "action": one of the actions above
-- "confidence": 0.0 to 1.0 (how confident you are)
-- "reasoning": brief explanation of your decision
-- "needs_clarification": true/false (if user needs to provide more details)
-"""
+        # Create context from the 3 messages before the new one, which is sent separately
+        recent_context = self._recent_context(messages, session_id)
         
-        # Use a simple agent to analyze intent
-        temp_agent = Agent(self.model)
-        result = await temp_agent.run(intent_prompt)
+        # Near-duplicate messages after the same context reuse a previous analysis instead of calling the LLM
+        cached_intent = self._intent_cache.get(user_message, recent_context)
+        if cached_intent is not None:
+            logger.debug("🧠 Intent Analysis (cached): %s", cached_intent)
+            return cached_intent
         
-        # Parse the response (fallback to general conversation if parsing fails)
+        # Identical messages after the same context already being analyzed share that in-flight LLM call
+        key = hashlib.blake2b(f"{recent_context}\0{user_message}".encode(), digest_size=16).hexdigest()
+        # The analysis runs as a detached task, so a cancelled requester does not cancel it for the others
+        task = self._intent_inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._classify_intent(user_message, recent_context))
+            self._intent_inflight[key] = task
+            task.add_done_callback(lambda _: self._intent_inflight.pop(key, None))
+        return dict(await asyncio.shield(task))
+    
+    async def _classify_intent(self, user_message: str, recent_context: str) -> Dict[str, Any]:
+        """Classify the user's intent with the LLM, caching successful results."""
+        intent_prompt = _INTENT_PROMPT_TMPL.format(recent_context=recent_context, user_message=user_message)
+        
+        # Use a simple agent with structured output to analyze intent
+        # (fallback to general conversation if the model output is invalid)
         try:
-            import json
-            response_text = str(result.output)
-            # Try to extract JSON from the response
-            if '{' in response_text and '}' in response_text:
-                start = response_text.find('{')
-                end = response_text.rfind('}') + 1
-                json_str = response_text[start:end]
-                intent_data = json.loads(json_str)
-            else:
-                # Fallback to general conversation
-                intent_data = {
-                    "action": "general_conversation",
-                    "confidence": 0.5,
-                    "reasoning": "Could not parse intent analysis",
-                    "needs_clarification": False
-                }
+            result = await self._intent_agent.run(intent_prompt)
+            intent_data = result.output.model_dump()
+            self._intent_cache.put(user_message, intent_data, recent_context)
         except Exception as e:
-            print(f"⚠️ Error parsing intent analysis: {e}")
+            logger.warning("⚠️ Error analyzing intent: %s", e)
             intent_data = {
                 "action": "general_conversation",
                 "confidence": 0.5,
-                "reasoning": "Error parsing intent",
+                "reasoning": "Could not analyze intent",
                 "needs_clarification": False
             }
         
-        print(f"🧠 Intent Analysis: {intent_data}")
+        logger.debug("🧠 Intent Analysis: %s", intent_data)
         return intent_data
     
     async def process_message(self, messages: List[ChatMessage], user_message: str, session_id: str = None) -> Dict[str, Any]:
         """Process a user message using intelligent intent analysis."""
-        print(f"💬 Processing message for session: {session_id or 'new'}")
-        print(f"📝 User message: {user_message[:100]}{'...' if len(user_message) > 100 else ''}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("💬 Processing message for session: %s", session_id or 'new')
+            logger.debug("📝 User message: %s%s", user_message[:100], '...' if len(user_message) > 100 else '')
         
         # Add the new user message
         messages.append(ChatMessage(role=MessageRole.USER, content=user_message))
         
-        # Use LLM to intelligently analyze user intent
-        intent_data = await self._analyze_user_intent(user_message, messages)
+        # Handle clarification responses (user provided more details after being asked)
+        # before intent analysis, so this turn needs no classification call
+        if len(messages) >= 3:
+            last_assistant_message = messages[-2].content.lower() if messages[-2].role == MessageRole.ASSISTANT else ""
+            if "clarification" in last_assistant_message or "more details" in last_assistant_message:
+                logger.debug("📝 Clarification response detected! Building extension...")
+                return await self.function_executor.execute_function(
+                    'build_extension',
+                    {'requirements': user_message, 'features': [], 'target_websites': []},
+                    messages,
+                    session_id
+                )
+        
+        # Use LLM to intelligently analyze user intent, preparing generation resources meanwhile
+        prewarm_task = asyncio.create_task(self.function_executor.prewarm(session_id))
+        try:
+            intent_data = await self._analyze_user_intent(user_message, messages, session_id)
+        except BaseException:
+            prewarm_task.cancel()
+            raise
         action = intent_data.get("action", "general_conversation")
+        if action in GENERATION_ACTIONS:
+            await prewarm_task
+        else:
+            prewarm_task.cancel()
         confidence = intent_data.get("confidence", 0.5)
         needs_clarification = intent_data.get("needs_clarification", False)
         
-        print(f"🎯 Detected action: {action} (confidence: {confidence:.2f})")
+        logger.debug("🎯 Detected action: %s (confidence: %.2f)", action, confidence)
         
         # Handle debug requests
         if action == "debug_analysis":
-            print(f"🔍 Debug request detected! Analyzing logs...")
+            logger.debug("🔍 Debug request detected! Analyzing logs...")
             return await self.debug_handler.handle_debug_request(messages, user_message, session_id)
         
         # Handle build requests
         if action == "build_extension":
             if needs_clarification:
-                print(f"🏗️ Build request detected but needs clarification...")
+                logger.debug("🏗️ Build request detected but needs clarification...")
                 clarification_message = f"""I'd be happy to help you build a Chrome extension! 
 
 To create the best extension for your needs, could you please provide more details about:
@@ -240,7 +345,7 @@ Please provide more specific details so I can create exactly what you need!"""
                     "action": "clarification_needed"
                 }
             else:
-                print(f"🏗️ Build request detected! Creating extension...")
+                logger.debug("🏗️ Build request detected! Creating extension...")
                 return await self.function_executor.execute_function(
                     'build_extension',
                     {'requirements': user_message, 'features': [], 'target_websites': []},
@@ -250,7 +355,7 @@ Please provide more specific details so I can create exactly what you need!"""
         
         # Handle improve requests
         if action == "improve_extension":
-            print(f"🚀 Improve request detected! Improving extension...")
+            logger.debug("🚀 Improve request detected! Improving extension...")
             return await self.function_executor.execute_function(
                 'improve_extension',
                 {'improvements': user_message, 'current_features': '', 'performance_issues': ''},
@@ -260,7 +365,7 @@ Please provide more specific details so I can create exactly what you need!"""
         
         # Handle fix requests
         if action == "fix_extension":
-            print(f"🔧 Fix request detected! Fixing extension...")
+            logger.debug("🔧 Fix request detected! Fixing extension...")
             return await self.function_executor.execute_function(
                 'fix_extension',
                 {'issues': user_message, 'error_logs': '', 'current_behavior': ''},
@@ -268,18 +373,6 @@ Please provide more specific details so I can create exactly what you need!"""
                 session_id
             )
         
-        # Handle clarification responses (user provided more details after being asked)
-        if len(messages) >= 3:
-            last_assistant_message = messages[-2].content if messages[-2].role == MessageRole.ASSISTANT else ""
-            if "clarification" in last_assistant_message.lower() or "more details" in last_assistant_message.lower():
-                print(f"📝 Clarification response detected! Building extension...")
-                return await self.function_executor.execute_function(
-                    'build_extension',
-                    {'requirements': user_message, 'features': [], 'target_websites': []},
-                    messages,
-                    session_id
-                )
-        
         # Handle general conversation
-        print(f"💭 General conversation detected...")
+        logger.debug("💭 General conversation detected...")
         return await self.function_executor._handle_general_conversation(messages, user_message) 
\ No newline at end of file
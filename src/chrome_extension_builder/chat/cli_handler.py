@@ -4,57 +4,204 @@ Gemini CLI integration for code generation using Pydantic AI.
 
 import os
 import json
-import subprocess
+import logging
+import re
 import tempfile
 import asyncio
+import functools
+import heapq
 import shutil
-from typing import List, Optional
+import time
+import uuid
+from typing import Iterator, List, Optional, Tuple
 from pathlib import Path
 
+from .._json import loads as _json_loads
 from ..models.extension import Extension, ExtensionManifest
+from . import session_store
+
+logger = logging.getLogger(__name__)
+
+# Temporary extension directories older than this are pruned
+TMP_MAX_AGE_SECONDS = 3600
+
+# npm global bin directory added to PATH for the Gemini CLI on Windows
+NPM_BIN_PATH = r"C:\Users\vikra\AppData\Roaming\npm"
+
+# Fallback locations of the Gemini CLI when it is not on PATH
+GEMINI_CLI_PATHS = [
+    r"C:\Users\vikra\AppData\Roaming\npm\gemini.cmd",
+    r"C:\Users\vikra\AppData\Roaming\npm\gemini",
+    r"C:\Users\vikra\AppData\Local\npm\gemini.cmd",
+    r"C:\Users\vikra\AppData\Local\npm\gemini"
+]
+
+# Runs of whitespace collapsed when flattening the CLI prompt
+_WS_RE = re.compile(r"\s+")
+
+# Custom icons copied into every generated extension
+ICON_SOURCE_DIR = Path("dummy_extension")
+ICON_FILES = ["icon16.png", "icon48.png", "icon128.png"]
+
+# Maximum number of generated files read at the same time
+READ_CONCURRENCY = 16
+
+# Files larger than this are read on every call instead of being kept in the read cache
+READ_CACHE_MAX_BYTES = 64 * 1024
+
+# Binary files (such as the copied icons) are left on disk and not loaded as extension text
+BINARY_SUFFIXES = frozenset({
+    ".png", ".jpg", ".jpeg", ".gif", ".ico", ".webp", ".bmp",
+    ".woff", ".woff2", ".ttf", ".otf", ".zip", ".crx", ".wasm",
+})
+
+# Most recently modified files listed in a modification prompt
+FILE_LIST_LIMIT = 200
+
+# CLI output lines buffered for the WebSocket before the oldest are dropped
+WS_QUEUE_SIZE = 256
+
+# CLI output lines are coalesced into one WebSocket frame per batch or per tick
+WS_BATCH_SIZE = 32
+WS_BATCH_SECONDS = 0.02
+
+# Longest wait for queued CLI output to reach the WebSocket once the CLI has exited
+WS_DRAIN_TIMEOUT_SECONDS = 5
+
+# Basic extension written when the Gemini CLI fails, encoded once at import
+FALLBACK_FILES = {
+    "manifest.json": json.dumps({
+        "manifest_version": 3,
+        "name": "Chrome Extension",
+        "version": "1.0.0",
+        "description": "A Chrome extension",
+        "permissions": ["activeTab"],
+        "action": {
+            "default_popup": "popup.html"
+        }
+    }, indent=2).encode(),
+    "popup.html": b"""<!DOCTYPE html>
+<html>
+<head>
+    <title>Chrome Extension</title>
+    <style>
+        body { width: 300px; padding: 20px; font-family: Arial, sans-serif; }
+        .header { background: #4285f4; color: white; padding: 10px; border-radius: 5px; }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h2>Chrome Extension</h2>
+    </div>
+    <p>This is a basic Chrome extension.</p>
+    <script src="popup.js"></script>
+</body>
+</html>""",
+    "popup.js": b"""// Basic popup script
+console.log('Chrome extension popup loaded!');""",
+}
+
+
+def _iter_files(root: str) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Recursively yield (relative_path, entry) for every file under root using os.scandir."""
+    prefix_len = len(root.rstrip(os.sep)) + 1
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path[prefix_len:], entry
+
+
+def _read_file(path: str) -> str:
+    """Read a text file as UTF-8, replacing undecodable bytes."""
+    with open(path, 'rb') as f:
+        return f.read().decode('utf-8', 'replace')
+
+
+@functools.lru_cache(maxsize=256)
+def _read_cached(path: str, mtime_ns: int, size: int) -> str:
+    """Read a small text file, memoized on its modification time and size so unchanged files are read once."""
+    return _read_file(path)
+
+
+def _read_text(path: str, mtime_ns: int, size: int) -> str:
+    """Read a text file, caching it only when it is small enough."""
+    if size > READ_CACHE_MAX_BYTES:
+        return _read_file(path)
+    return _read_cached(path, mtime_ns, size)
 
 
 class CLIHandler:
     """Handles Gemini CLI integration for code generation."""
     
-    def __init__(self, model, websocket=None):
+    def __init__(self, model):
         """Initialize the CLI handler."""
         self.model = model
-        self.websocket = websocket
+        
+        # Per-process root for extensions generated without a session
+        self._tmp_root = Path(tempfile.gettempdir()) / "cext_builder"
+        self._tmp_root.mkdir(exist_ok=True)
+        self._prune_task: Optional[asyncio.Task] = None
+        
+        # Environment for the Gemini CLI, built once and reused for every call
+        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY") or ""
+        self._env = {
+            **os.environ,
+            "GEMINI_API_KEY": api_key,
+            "GOOGLE_API_KEY": api_key,
+            "PATH": NPM_BIN_PATH + os.pathsep + os.environ.get("PATH", "")
+        }
+        
+        # Load the static custom icons once so each generation only writes them
+        self._icon_bytes = {}
+        for icon_file in ICON_FILES:
+            source_path = ICON_SOURCE_DIR / icon_file
+            if source_path.exists():
+                self._icon_bytes[icon_file] = source_path.read_bytes()
+            else:
+                logger.warning("⚠️  Source icon %s not found", icon_file)
+        
+        # Resolve the Gemini CLI once instead of probing it on every generation
+        self._gemini_path = shutil.which("gemini") or next(
+            (path for path in GEMINI_CLI_PATHS if os.path.exists(path)), None
+        )
     
     async def generate_extension_with_gemini_cli(self, requirements: str, features: List[str], 
                                                target_websites: List[str], messages: List, 
                                                session_id: str = None, is_fix: bool = False, 
                                                is_improvement: bool = False) -> Extension:
         """Use Gemini CLI to generate a Chrome extension."""
-        print(f"🎯 Starting extension generation for session: {session_id or 'new'}")
+        logger.debug("🎯 Starting extension generation for session: %s", session_id or 'new')
         
-        # Create persistent extension directory based on session ID
-        if session_id:
-            extensions_dir = Path("extensions")
-            extensions_dir.mkdir(exist_ok=True)
-            extension_dir = extensions_dir / session_id
-            extension_dir.mkdir(exist_ok=True)
-            print(f"📂 Using persistent directory: {extension_dir}")
-        else:
-            # Fallback to temporary directory for non-session cases
-            temp_dir = tempfile.mkdtemp()
-            extension_dir = Path(temp_dir)
-            print(f"📂 Using temporary directory: {extension_dir}")
+        if self._prune_task is None or self._prune_task.done():
+            self._prune_task = asyncio.create_task(self._prune_tmp_root())
+        extension_dir = self.prepare_extension_dir(session_id)
+        logger.debug("📂 Using extension directory: %s", extension_dir)
         
         try:
             # Prepare the prompt for Gemini CLI
             features_text = f"\nFeatures: {', '.join(features)}" if features else ""
             websites_text = f"\nTarget websites: {', '.join(target_websites)}" if target_websites else ""
             
-            # Check if this is a modification request (extension already exists)
-            existing_files = list(extension_dir.rglob("*")) if extension_dir.exists() else []
-            is_modification = len(existing_files) > 0 or is_fix or is_improvement
+            # Check if this is a modification request (extension already exists),
+            # trusting the flags first and otherwise stopping at the first file found
+            is_modification = is_fix or is_improvement or next(_iter_files(str(extension_dir)), None) is not None
+            
+            # Snapshot of existing files and their mtimes, used to spot what the CLI changed
+            existing_files = {}
+            if is_modification:
+                existing_files = {rel_path: entry.stat().st_mtime_ns for rel_path, entry in _iter_files(str(extension_dir))}
             
             if is_modification:
-                print(f"🔧 Modifying existing extension with {len(existing_files)} files")
+                logger.debug("🔧 Modifying existing extension with %d files", len(existing_files))
                 # For modifications, provide context about existing files
-                file_list = "\n".join([f"- {f.relative_to(extension_dir)}" for f in existing_files if f.is_file()])
+                recent_files = heapq.nlargest(FILE_LIST_LIMIT, existing_files, key=existing_files.get)
+                file_list = "\n".join(f"- {rel_path}" for rel_path in recent_files)
+                if len(existing_files) > FILE_LIST_LIMIT:
+                    file_list += f"\n... and {len(existing_files) - FILE_LIST_LIMIT} more files"
                 cli_prompt = f"""
                 Modify the existing Chrome extension based on these requirements:
                 
@@ -69,7 +216,7 @@ class CLIHandler:
                 IMPORTANT: Do NOT generate any PNG image files. Use the existing icon files or create text-based placeholders.
                 """
             else:
-                print(f"🆕 Creating new extension from scratch")
+                logger.debug("🆕 Creating new extension from scratch")
                 # For new extensions, create complete structure
                 cli_prompt = f"""
                 Create a complete Chrome extension based on these requirements:
@@ -88,36 +235,44 @@ class CLIHandler:
                 IMPORTANT: Do NOT generate any PNG image files. The icon files will be copied from the existing template.
                 """
             
-            print(f"📝 Requirements: {requirements[:100]}{'...' if len(requirements) > 100 else ''}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📝 Requirements: %s%s", requirements[:100], '...' if len(requirements) > 100 else '')
             
             # Call Gemini CLI
-            print(f"🤖 Calling Gemini CLI...")
-            extension_files = await self._call_gemini_cli(cli_prompt, extension_dir)
+            logger.debug("🤖 Calling Gemini CLI...")
+            await self._call_gemini_cli(cli_prompt, extension_dir, session_id)
             
-            print(f"📖 Reading generated files...")
+            logger.debug("📖 Reading generated files...")
             # Read the generated files
-            files = {}
-            manifest_data = {}
+            # Read all files concurrently in worker threads, then parse the manifest
+            entries = [
+                (rel_path, entry.path, entry.stat())
+                for rel_path, entry in _iter_files(str(extension_dir))
+                if os.path.splitext(rel_path)[1].lower() not in BINARY_SUFFIXES
+            ]
+            semaphore = asyncio.Semaphore(READ_CONCURRENCY)
+            
+            async def read_one(path: str, stat: os.stat_result) -> str:
+                async with semaphore:
+                    return await asyncio.to_thread(_read_text, path, stat.st_mtime_ns, stat.st_size)
+            
+            contents = await asyncio.gather(*(read_one(path, stat) for _, path, stat in entries))
+            files = {rel_path: content for (rel_path, _, _), content in zip(entries, contents)}
+            changed = sum(existing_files.get(rel_path) != stat.st_mtime_ns for rel_path, _, stat in entries)
+            logger.debug("📖 %d of %d files are new or changed", changed, len(files))
             
-            for file_path in extension_dir.rglob("*"):
-                if file_path.is_file():
-                    relative_path = file_path.relative_to(extension_dir)
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        files[str(relative_path)] = content
-                        
-                        # Extract manifest data
-                        if relative_path.name == "manifest.json":
-                            try:
-                                manifest_data = json.loads(content)
-                                print(f"📋 Found manifest.json with name: {manifest_data.get('name', 'Unknown')}")
-                            except json.JSONDecodeError:
-                                print(f"⚠️  Warning: Could not parse manifest.json")
+            manifest_data = {}
+            if "manifest.json" in files:
+                try:
+                    manifest_data = _json_loads(files["manifest.json"])
+                    logger.debug("📋 Found manifest.json with name: %s", manifest_data.get('name', 'Unknown'))
+                except json.JSONDecodeError:
+                    logger.warning("⚠️  Warning: Could not parse manifest.json")
             
             # Copy custom icons to the extension directory
             await self._copy_custom_icons(extension_dir)
             
-            print(f"📦 Creating extension object with {len(files)} files")
+            logger.debug("📦 Creating extension object with %d files", len(files))
             # Create extension object
             manifest = ExtensionManifest(
                 name=manifest_data.get("name", "Chrome Extension"),
@@ -134,149 +289,72 @@ class CLIHandler:
                 files=files
             )
             
-            print(f"✅ Extension generation completed successfully!")
-            print(f"📊 Extension summary:")
-            print(f"   - Name: {extension.name}")
-            print(f"   - Description: {extension.description}")
-            print(f"   - Files: {len(files)}")
-            print(f"   - ID: {extension.id}")
+            logger.debug(
+                "✅ Extension generation completed: name=%s, files=%d, id=%s",
+                extension.name, len(files), extension.id
+            )
             
             return extension
             
         except Exception as e:
-            print(f"❌ Error generating extension: {e}")
+            logger.error("❌ Error generating extension: %s", e)
             # Fallback to basic extension
             return await self._create_fallback_extension(extension_dir)
     
+    def prepare_extension_dir(self, session_id: str = None) -> Path:
+        """Create the extension directory: persistent per session, otherwise a fresh subdir of the tmp root."""
+        extension_dir = (Path("extensions") if session_id else self._tmp_root) / (session_id or uuid.uuid4().hex)
+        extension_dir.mkdir(parents=True, exist_ok=True)
+        return extension_dir
+    
+    async def _prune_tmp_root(self):
+        """Periodically remove stale temporary extension directories."""
+        while True:
+            try:
+                cutoff = time.time() - TMP_MAX_AGE_SECONDS
+                for entry in self._tmp_root.iterdir():
+                    try:
+                        if entry.stat().st_mtime < cutoff:
+                            await asyncio.to_thread(shutil.rmtree, entry, True)
+                    except OSError as e:
+                        logger.warning("⚠️  Error pruning %s: %s", entry, e)
+            except Exception as e:
+                # Keep the loop alive; the next sweep retries
+                logger.warning("⚠️  Error sweeping %s: %s", self._tmp_root, e)
+            await asyncio.sleep(TMP_MAX_AGE_SECONDS)
+    
     async def _copy_custom_icons(self, extension_dir: Path):
-        """Copy custom icons from the dummy_extension to the new extension directory."""
+        """Write the cached custom icons into the new extension directory."""
         try:
-            # Source icon directory
-            source_icon_dir = Path("dummy_extension")
-            
-            # Icon files to copy
-            icon_files = ["icon16.png", "icon48.png", "icon128.png"]
-            
-            print(f"🎨 Copying custom icons...")
-            for icon_file in icon_files:
-                source_path = source_icon_dir / icon_file
-                dest_path = extension_dir / icon_file
-                
-                if source_path.exists():
-                    shutil.copy2(source_path, dest_path)
-                    print(f"   ✅ Copied {icon_file}")
-                else:
-                    print(f"   ⚠️  Source icon {icon_file} not found")
-            
-            # Also copy to images directory if it exists
+            logger.debug("🎨 Copying custom icons...")
+            # Write into the extension root, and into images/ if it exists, concurrently
+            dest_dirs = [extension_dir]
             images_dir = extension_dir / "images"
             if images_dir.exists():
-                for icon_file in icon_files:
-                    source_path = source_icon_dir / icon_file
-                    dest_path = images_dir / icon_file
-                    
-                    if source_path.exists():
-                        shutil.copy2(source_path, dest_path)
-                        print(f"   ✅ Copied {icon_file} to images/")
+                dest_dirs.append(images_dir)
+            
+            await asyncio.gather(*(
+                asyncio.to_thread((dest_dir / icon_file).write_bytes, data)
+                for dest_dir in dest_dirs
+                for icon_file, data in self._icon_bytes.items()
+            ))
+            logger.debug("   ✅ Copied %d icons to %d location(s)", len(self._icon_bytes), len(dest_dirs))
             
         except Exception as e:
-            print(f"⚠️  Error copying icons: {e}")
+            logger.warning("⚠️  Error copying icons: %s", e)
     
-    async def _call_gemini_cli(self, prompt: str, output_dir: Path) -> List[str]:
-        """Call Gemini CLI to generate code."""
-        import subprocess
-        import os
-        
+    async def _call_gemini_cli(self, prompt: str, output_dir: Path, session_id: str = None) -> None:
+        """Call Gemini CLI to generate code into output_dir, streaming output to the session's WebSockets."""
         try:
-            print(f"🚀 Starting Gemini CLI code generation...")
-            print(f"📁 Working directory: {output_dir}")
-            
-            # Set up environment variables
-            env = os.environ.copy()
-            # Get API key from the agent's model configuration
-            env["GEMINI_API_KEY"] = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-            env["GOOGLE_API_KEY"] = env["GEMINI_API_KEY"]  # Also set this for compatibility
-            
-            # Add npm global bin to PATH for Windows
-            npm_bin_path = r"C:\Users\vikra\AppData\Roaming\npm"
-            if npm_bin_path not in env.get("PATH", ""):
-                env["PATH"] = npm_bin_path + os.pathsep + env.get("PATH", "")
-            
-            # Run Gemini CLI command with full path and correct options
-            gemini_path = r"C:\Users\vikra\AppData\Roaming\npm\gemini.cmd"
-            
-            # Test if the gemini command exists and is accessible
-            
-            # Check if the file actually exists
-            if not os.path.exists(gemini_path):
-                print(f"❌ Gemini CLI file not found at: {gemini_path}")
-                # Try alternative paths
-                alt_paths = [
-                    r"C:\Users\vikra\AppData\Roaming\npm\gemini",
-                    r"C:\Users\vikra\AppData\Roaming\npm\gemini.cmd",
-                    r"C:\Users\vikra\AppData\Local\npm\gemini.cmd",
-                    r"C:\Users\vikra\AppData\Local\npm\gemini"
-                ]
-                
-                for alt_path in alt_paths:
-                    if os.path.exists(alt_path):
-                        print(f"✅ Found Gemini CLI at: {alt_path}")
-                        gemini_path = alt_path
-                        break
-                else:
-                    raise Exception(f"Gemini CLI not found at any of the expected paths: {[gemini_path] + alt_paths}")
+            logger.debug("🚀 Starting Gemini CLI code generation in %s", output_dir)
             
-            # Test if the command is accessible
-            try:
-                test_result = subprocess.run([gemini_path, "--help"], 
-                                          capture_output=True, text=True, timeout=5)
-                print(f"✅ Gemini CLI is accessible (help output length: {len(test_result.stdout)})")
-            except Exception as e:
-                print(f"❌ Gemini CLI test failed: {e}")
-                raise Exception(f"Gemini CLI not accessible at {gemini_path}: {e}")
-            
-            print(f"🔧 Executing: {gemini_path} --yolo --model gemini-2.5-flash --prompt [prompt]")
-            print(f"📁 Working directory: {output_dir}")
-            print(f"🔑 API Key available: {'✓' if env.get('GEMINI_API_KEY') else '✗'}")
-            print(f"🌐 PATH includes npm: {'✓' if npm_bin_path in env.get('PATH', '') else '✗'}")
-            # Convert multi-line prompt to single line
-            single_line_prompt = prompt.replace('\n', ' ').replace('\r', ' ').strip()
-            # Remove extra spaces
-            single_line_prompt = ' '.join(single_line_prompt.split())
-            
-            print(f"📝 Original prompt length: {len(prompt)} characters")
-            print(f"📝 Single-line prompt length: {len(single_line_prompt)} characters")
-            print(f"📝 Single-line prompt preview: {single_line_prompt[:100]}...")
-            
-            # Test with a simple prompt first to see if the issue is with the prompt
-            test_prompt = "Create a simple Chrome extension that shows 'Hello World' in a popup"
-            test_command = f"{gemini_path} --yolo --model gemini-2.5-flash --prompt \"{test_prompt}\""
-            print(f"🧪 Testing with simple prompt first...")
-            print(f"🧪 Test command: {test_command}")
-            print(f"🧪 Test command length: {len(test_command)} characters")
-            
-            test_process = await asyncio.create_subprocess_exec(
-                gemini_path,
-                "--yolo",
-                "--model", "gemini-2.5-flash",
-                "--prompt", test_prompt,
-                stdin=asyncio.subprocess.PIPE,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=env,
-                cwd=str(output_dir)
-            )
+            # Run Gemini CLI command with the path resolved at startup
+            gemini_path = self._gemini_path
+            if not gemini_path:
+                raise Exception(f"Gemini CLI not found on PATH or at any of the expected paths: {GEMINI_CLI_PATHS}")
             
-            # Wait a bit for test process
-            await asyncio.sleep(3)
-            if test_process.returncode is not None:
-                stdout, stderr = await test_process.communicate()
-                print(f"🧪 Test process completed with return code: {test_process.returncode}")
-                print(f"🧪 Test STDOUT: {stdout.decode()}")
-                print(f"🧪 Test STDERR: {stderr.decode()}")
-            else:
-                print(f"🧪 Test process is still running, proceeding with main process...")
-                test_process.terminate()
+            # Convert multi-line prompt to a single line with single spaces
+            single_line_prompt = _WS_RE.sub(" ", prompt).strip()
             
             # Use the exact command structure that works in terminal
             try:
@@ -287,53 +365,35 @@ class CLIHandler:
                     "--model", "gemini-2.5-flash",
                     "--prompt", single_line_prompt
                 ]
-                print(f"🔧 Command args: {cmd_args}")
-                
-                # Log the full command that would be executed in terminal
-                full_command = f"{gemini_path} --yolo --model gemini-2.5-flash --prompt \"{single_line_prompt}\""
-                print(f"🔧 Full command to execute:")
-                print(f"   {full_command}")
-                print(f"🔧 Command length: {len(full_command)} characters")
-                print(f"🔧 Working directory: {output_dir}")
-                print(f"🔧 Environment variables:")
-                print(f"   GEMINI_API_KEY: {'✓' if env.get('GEMINI_API_KEY') else '✗'}")
-                print(f"   GOOGLE_API_KEY: {'✓' if env.get('GOOGLE_API_KEY') else '✗'}")
-                print(f"   PATH includes npm: {'✓' if npm_bin_path in env.get('PATH', '') else '✗'}")
-                print(f"🔧 Full PATH: {env.get('PATH', '')[:200]}...")
+                logger.debug("🔧 Executing: %s --yolo --model gemini-2.5-flash --prompt [%d chars]",
+                             gemini_path, len(single_line_prompt))
                 
                 process = await asyncio.create_subprocess_exec(
                     *cmd_args,
                     stdin=asyncio.subprocess.PIPE,
                     stdout=asyncio.subprocess.PIPE,
                     stderr=asyncio.subprocess.PIPE,
-                    env=env,
+                    env=self._env,
                     cwd=str(output_dir)
                 )
-                print(f"✅ Subprocess created successfully with PID: {process.pid}")
+                logger.debug("✅ Subprocess created successfully with PID: %s", process.pid)
             except Exception as e:
-                print(f"❌ Failed to create subprocess: {e}")
+                logger.error("❌ Failed to create subprocess: %s", e)
                 raise
             
-            print(f"⏳ Streaming Gemini CLI output...")
-            
-            # Add a small delay to see if process starts
-            await asyncio.sleep(1)
-            
-            # Check if process is still running
-            if process.returncode is not None:
-                print(f"❌ Process exited immediately with return code: {process.returncode}")
-                # Get any output that might have been produced
-                stdout, stderr = await process.communicate()
-                print(f"STDOUT: {stdout.decode()}")
-                print(f"STDERR: {stderr.decode()}")
-                raise Exception("Process exited immediately")
+            logger.debug("⏳ Streaming Gemini CLI output...")
             
-            print(f"✅ Process is still running, starting real-time streaming...")
-            
-            # Stream stdout and stderr in real-time
+            # Stream stdout and stderr in real-time; an early exit shows up as EOF plus a nonzero return code
             stdout_lines = []
             stderr_lines = []
             
+            echo = logger.isEnabledFor(logging.DEBUG)
+            
+            # Lines are handed to a separate WebSocket sender so a slow client never stalls the pipes
+            connected = session_store.is_connected(session_id)
+            ws_queue: Optional[asyncio.Queue] = asyncio.Queue(maxsize=WS_QUEUE_SIZE) if connected else None
+            ws_task = asyncio.create_task(self._drain_ws(ws_queue, session_id)) if ws_queue else None
+            
             async def read_stream(stream, lines_list, stream_name):
                 """Read from stream and collect lines in real-time."""
                 while True:
@@ -343,18 +403,18 @@ class CLIHandler:
                     line_str = line.decode('utf-8', errors='ignore').strip()
                     if line_str:
                         lines_list.append(line_str)
-                        print(f"📤 {stream_name.upper()}: {line_str}")
+                        if echo:
+                            logger.debug("📤 %s: %s", stream_name.upper(), line_str)
                         
-                        # Send to WebSocket if available
-                        if self.websocket:
+                        # Queue for the WebSocket if available, dropping the oldest line when full
+                        if ws_queue:
+                            item = {"stream": stream_name, "content": line_str}
                             try:
-                                await self.websocket.send_json({
-                                    "type": "cli_output",
-                                    "stream": stream_name,
-                                    "content": line_str
-                                })
-                            except Exception as e:
-                                print(f"⚠️ WebSocket error: {e}")
+                                ws_queue.put_nowait(item)
+                            except asyncio.QueueFull:
+                                ws_queue.get_nowait()
+                                ws_queue.task_done()
+                                ws_queue.put_nowait(item)
             
             # Start reading from both streams concurrently
             try:
@@ -363,102 +423,87 @@ class CLIHandler:
                     read_stream(process.stderr, stderr_lines, "stderr")
                 )
                 return_code = await process.wait()
-                print(f"✅ Process completed with return code: {return_code}")
+                logger.debug("✅ Process completed with return code: %s", return_code)
+                if ws_queue:
+                    try:
+                        await asyncio.wait_for(ws_queue.join(), WS_DRAIN_TIMEOUT_SECONDS)
+                    except asyncio.TimeoutError:
+                        # A stalled client must not hold up generation; the sender is cancelled below
+                        logger.warning("⚠️ Timed out flushing CLI output to the WebSocket")
             except Exception as e:
-                print(f"❌ Error during streaming: {e}")
+                logger.error("❌ Error during streaming: %s", e)
                 process.terminate()
                 raise
+            finally:
+                if ws_task:
+                    ws_task.cancel()
             
             if return_code != 0:
-                print(f"❌ Gemini CLI error (return code: {return_code}):")
-                if stderr_lines:
-                    print(f"❌ STDERR:")
-                    for line in stderr_lines:
-                        print(f"   {line}")
-                if stdout_lines:
-                    print(f"📤 STDOUT:")
-                    for line in stdout_lines:
-                        print(f"   {line}")
+                logger.error("❌ Gemini CLI error (return code: %s)", return_code)
+                if echo:
+                    logger.debug("❌ STDERR:\n%s", "\n".join(stderr_lines))
+                    logger.debug("📤 STDOUT:\n%s", "\n".join(stdout_lines))
                 
-                # Send error to WebSocket if available
-                if self.websocket:
+                # Send error to the session's WebSockets if any
+                if session_store.is_connected(session_id):
                     try:
                         error_message = f"Gemini CLI failed with return code {return_code}"
                         if stderr_lines:
                             error_message += f"\nError: {' '.join(stderr_lines)}"
-                        await self.websocket.send_json({
+                        await session_store.send_json(session_id, {
                             "type": "cli_output",
                             "stream": "stderr",
                             "content": error_message
                         })
                     except Exception as e:
-                        print(f"⚠️ WebSocket error: {e}")
+                        logger.warning("⚠️ WebSocket error: %s", e)
                 
                 # Fallback to basic extension
-                return await self._create_fallback_extension(output_dir)
-            
-            print(f"✅ Gemini CLI completed successfully!")
-            print(f"📄 Generated files:")
+                await self._create_fallback_extension(output_dir)
+                return
             
-            # Return list of generated files
-            files = [str(f.relative_to(output_dir)) for f in output_dir.rglob("*") if f.is_file()]
-            for file in files:
-                print(f"   - {file}")
-            
-            return files
+            logger.debug("✅ Gemini CLI completed successfully!")
             
         except Exception as e:
-            print(f"❌ Error calling Gemini CLI: {e}")
+            logger.error("❌ Error calling Gemini CLI: %s", e)
             # Fallback to basic extension
-            return await self._create_fallback_extension(output_dir)
+            await self._create_fallback_extension(output_dir)
+    
+    async def _drain_ws(self, queue: asyncio.Queue, session_id: str):
+        """Send queued CLI output to the session's WebSockets in batches until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            # Collect up to WS_BATCH_SIZE lines or whatever arrives within WS_BATCH_SECONDS
+            batch = [await queue.get()]
+            deadline = loop.time() + WS_BATCH_SECONDS
+            while len(batch) < WS_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                # Output for a session whose sockets have all closed is dropped
+                if session_store.is_connected(session_id):
+                    await session_store.send_json(session_id, {"type": "cli_output_batch", "entries": batch})
+            except Exception as e:
+                logger.warning("⚠️ WebSocket error: %s", e)
+            finally:
+                for _ in batch:
+                    queue.task_done()
     
     async def _create_fallback_extension(self, output_dir: Path) -> List[str]:
         """Create a basic fallback extension if Gemini CLI fails."""
-        # Create basic manifest.json
-        manifest = {
-            "manifest_version": 3,
-            "name": "Chrome Extension",
-            "version": "1.0.0",
-            "description": "A Chrome extension",
-            "permissions": ["activeTab"],
-            "action": {
-                "default_popup": "popup.html"
-            }
-        }
-        
-        with open(output_dir / "manifest.json", 'w') as f:
-            json.dump(manifest, f, indent=2)
-        
-        # Create basic popup.html
-        popup_html = """<!DOCTYPE html>
-<html>
-<head>
-    <title>Chrome Extension</title>
-    <style>
-        body { width: 300px; padding: 20px; font-family: Arial, sans-serif; }
-        .header { background: #4285f4; color: white; padding: 10px; border-radius: 5px; }
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h2>Chrome Extension</h2>
-    </div>
-    <p>This is a basic Chrome extension.</p>
-    <script src="popup.js"></script>
-</body>
-</html>"""
-        
-        with open(output_dir / "popup.html", 'w') as f:
-            f.write(popup_html)
-        
-        # Create basic popup.js
-        popup_js = """// Basic popup script
-console.log('Chrome extension popup loaded!');"""
-        
-        with open(output_dir / "popup.js", 'w') as f:
-            f.write(popup_js)
+        # Write the prebuilt manifest.json, popup.html and popup.js concurrently
+        await asyncio.gather(*(
+            asyncio.to_thread((output_dir / name).write_bytes, data)
+            for name, data in FALLBACK_FILES.items()
+        ))
         
         # Copy custom icons
         await self._copy_custom_icons(output_dir)
         
-        return ["manifest.json", "popup.html", "popup.js"] 
\ No newline at end of file
+        return list(FALLBACK_FILES)
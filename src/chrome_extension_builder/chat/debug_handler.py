@@ -2,27 +2,46 @@
 Debug handling implementation for the chat agent using Pydantic AI.
 """
 
-from typing import Dict, List, Any, Optional
+import logging
+from typing import Callable, Dict, List, Any, Optional, Tuple
 
+from pydantic_ai import Agent
+
+from ..api import routes as _routes_module
 from ..models.chat import ChatMessage
+from . import session_store
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of formatted log blocks kept in memory
+FMT_CACHE_SIZE = 32
+
+# Caps on the errors and user actions included in the analysis prompt
+MAX_ERRORS = 50
+MAX_ACTIONS = 100
+
+# Error severities ranked most severe first; unknown severities sort last
+SEVERITY_RANK = {"critical": 0, "error": 1, "warning": 2, "info": 3}
 
 
 class DebugHandler:
     """Handles debug-related requests and log analysis."""
     
-    def __init__(self, model, websocket=None):
+    def __init__(self, model):
         """Initialize the debug handler."""
         self.model = model
-        self.websocket = websocket
+        self._fmt_cache: Dict[Tuple, str] = {}
+        
+        # Tool-less agent reused for every debug analysis
+        self._agent = Agent(model)
     
     async def handle_debug_request(self, messages: List[ChatMessage], user_message: str, session_id: str = None) -> Dict[str, Any]:
         """Handle debug-related requests by analyzing browser logs."""
-        print(f"🔍 Handling debug request for session: {session_id}")
+        logger.debug("🔍 Handling debug request for session: %s", session_id)
         
         try:
-            # Try to get debug logs from browser manager
-            from ..browser.manager import BrowserManager
-            from ..api.routes import _browser_manager
+            # Try to get debug logs from browser manager (module state, looked up per call)
+            _browser_manager = _routes_module._browser_manager
             
             if not _browser_manager or not _browser_manager.current_debug_session:
                 response = """I don't see any active debug session. To analyze issues with your extension:
@@ -53,45 +72,47 @@ The debug system will capture all events, errors, and console output for analysi
                     "action": "debug_no_logs"
                 }
             
-            # Analyze logs with AI
-            analysis_prompt = f"""
-            Analyze these browser debug logs and help the user understand any issues:
-
-            **User Question:** {user_message}
-
-            **Debug Summary:**
-            {logs.summary}
-
-            **Errors Found ({len(logs.errors)}):**
-            {self._format_errors_for_ai(logs.errors)}
-
-            **User Actions ({len(logs.user_actions)}):**
-            {self._format_user_actions_for_ai(logs.user_actions)}
-
-            **Console Output ({len(logs.console_output)} entries):**
-            {self._format_console_output_for_ai(logs.console_output)}
-
-            **AI Recommendations:**
-            {logs.recommendations}
-
-            Please provide:
-            1. A clear analysis of any issues found
-            2. Specific recommendations for fixing problems
-            3. Suggestions for improving the extension
-            4. Code examples if needed for fixes
-
-            Be helpful and actionable in your response.
-            """
+            # Build the analysis prompt, formatting only the log sections that have entries
+            parts = [
+                "Analyze these browser debug logs and help the user understand any issues:",
+                f"**User Question:** {user_message}",
+                f"**Debug Summary:**\n{logs.summary}",
+            ]
+            
+            # Format log sections, reusing cached text while a section's newest entry is unchanged
+            session_id = debug_session.id
+            if logs.errors:
+                key = ("errors", session_id, len(logs.errors), logs.errors[-1].id)
+                errors_text = self._format_cached(key, self._format_top_errors, logs.errors)
+                parts.append(f"**Errors Found ({len(logs.errors)}):**\n{errors_text}")
+            if logs.user_actions:
+                key = ("actions", session_id, len(logs.user_actions), logs.user_actions[-1].id)
+                actions_text = self._format_cached(key, self._format_recent_actions, logs.user_actions)
+                parts.append(f"**User Actions ({len(logs.user_actions)}):**\n{actions_text}")
+            if logs.console_output:
+                # Only the last 10 entries are formatted, so they are the key
+                key = ("console", session_id, *logs.console_output[-10:])
+                console_text = self._format_cached(key, self._format_console_output_for_ai, logs.console_output)
+                parts.append(f"**Console Output ({len(logs.console_output)} entries):**\n{console_text}")
+            if logs.recommendations:
+                parts.append(f"**AI Recommendations:**\n{logs.recommendations}")
+            
+            parts.append(
+                "Please provide:\n"
+                "1. A clear analysis of any issues found\n"
+                "2. Specific recommendations for fixing problems\n"
+                "3. Suggestions for improving the extension\n"
+                "4. Code examples if needed for fixes\n\n"
+                "Be helpful and actionable in your response."
+            )
+            analysis_prompt = "\n\n".join(parts)
             
             # Use the model directly for debug analysis
-            from pydantic_ai import Agent
-            temp_agent = Agent(self.model)
-            result = await temp_agent.run(analysis_prompt)
-            response = str(result.output) if hasattr(result, 'output') else "I'm analyzing the debug logs..."
+            response = await self._run_analysis(self._agent, analysis_prompt, session_id) or "I'm analyzing the debug logs..."
             
             messages.append(ChatMessage(role="assistant", content=response))
             
-            print(f"✅ Debug analysis completed")
+            logger.debug("✅ Debug analysis completed")
             return {
                 "response": response,
                 "extension": None,
@@ -105,7 +126,7 @@ The debug system will capture all events, errors, and console output for analysi
             }
             
         except Exception as e:
-            print(f"❌ Error handling debug request: {e}")
+            logger.error("❌ Error handling debug request: %s", e)
             response = f"I encountered an error while analyzing the debug logs: {str(e)}. Please try again or check if the browser session is still active."
             
             messages.append(ChatMessage(role="assistant", content=response))
@@ -115,36 +136,62 @@ The debug system will capture all events, errors, and console output for analysi
                 "action": "debug_error"
             }
     
+    async def _run_analysis(self, agent, prompt: str, session_id: str = None) -> str:
+        """Run the analysis, streaming text deltas to the session's WebSockets when any are open."""
+        if not session_store.is_connected(session_id):
+            result = await agent.run(prompt)
+            return str(result.output)
+        
+        parts = []
+        async with agent.run_stream(prompt) as result:
+            async for delta in result.stream_text(delta=True):
+                parts.append(delta)
+                await session_store.send_json(session_id, {"type": "chat_token", "content": delta})
+        return "".join(parts)
+    
+    def _format_cached(self, key: Tuple, formatter: Callable[[List], str], items: List) -> str:
+        """Return the formatted block for items, reusing it while the key is unchanged."""
+        if key not in self._fmt_cache:
+            if len(self._fmt_cache) >= FMT_CACHE_SIZE:
+                self._fmt_cache.pop(next(iter(self._fmt_cache)))
+            self._fmt_cache[key] = formatter(items)
+        return self._fmt_cache[key]
+    
+    def _format_top_errors(self, errors: List) -> str:
+        """Format only the most severe errors."""
+        top_errors = sorted(errors, key=lambda e: SEVERITY_RANK.get(e.severity, len(SEVERITY_RANK)))[:MAX_ERRORS]
+        return self._format_errors_for_ai(top_errors)
+    
+    def _format_recent_actions(self, actions: List) -> str:
+        """Format only the most recent user actions."""
+        return self._format_user_actions_for_ai(actions[-MAX_ACTIONS:])
+    
     def _format_errors_for_ai(self, errors: List) -> str:
         """Format errors for AI analysis."""
         if not errors:
             return "No errors found."
         
-        formatted = []
-        for error in errors:
-            formatted.append(f"- Type: {error.type}")
-            formatted.append(f"  Message: {error.message}")
-            formatted.append(f"  URL: {error.url or 'unknown'}")
-            formatted.append(f"  Severity: {error.severity}")
-            if error.stack_trace:
-                formatted.append(f"  Stack: {error.stack_trace[:200]}...")
-            formatted.append("")
-        
-        return "\n".join(formatted)
+        return "\n".join(
+            f"- Type: {error.type}\n"
+            f"  Message: {error.message}\n"
+            f"  URL: {error.url or 'unknown'}\n"
+            f"  Severity: {error.severity}"
+            + (f"\n  Stack: {error.stack_trace[:200]}..." if error.stack_trace else "")
+            + "\n"
+            for error in errors
+        )
     
     def _format_user_actions_for_ai(self, actions: List) -> str:
         """Format user actions for AI analysis."""
         if not actions:
             return "No user actions recorded."
         
-        formatted = []
-        for action in actions:
-            formatted.append(f"- {action.type.value}: {action.data}")
-            formatted.append(f"  URL: {action.url or 'unknown'}")
-            formatted.append(f"  Time: {action.timestamp}")
-            formatted.append("")
-        
-        return "\n".join(formatted)
+        return "\n".join(
+            f"- {action.type.value}: {action.data}\n"
+            f"  URL: {action.url or 'unknown'}\n"
+            f"  Time: {action.timestamp}\n"
+            for action in actions
+        )
     
     def _format_console_output_for_ai(self, console_logs: List[str]) -> str:
         """Format console output for AI analysis."""
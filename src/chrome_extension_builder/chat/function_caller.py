@@ -3,13 +3,56 @@ Function calling implementation for the chat agent using Pydantic AI.
 """
 
 from typing import Dict, List, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 from ..models.chat import ChatMessage, MessageRole
 
+# Prefixes of the tool output messages, shared by the tools and the function executor
+BUILD_MESSAGE_PREFIX = "Building extension with requirements: "
+FIX_MESSAGE_PREFIX = "Fixing extension issues: "
+IMPROVE_MESSAGE_PREFIX = "Improving extension with: "
+
+# Speaker prefix for each message role when rendering a conversation
+ROLE_PREFIX = {
+    MessageRole.USER: "User: ",
+    MessageRole.ASSISTANT: "Assistant: ",
+    MessageRole.SYSTEM: "Assistant: "
+}
+
+# Fixed halves of the conversation context prompt, wrapped around the recent messages
+_PROMPT_HEADER = """
+You are a helpful Chrome extension development assistant. Based on the conversation below, determine which function to call or provide a helpful response.
+
+Available functions:
+- build_extension: Create a new Chrome extension from scratch
+- fix_extension: Fix issues or bugs in an existing extension  
+- improve_extension: Enhance an existing extension with new features
+- answer_user_question: Answer general questions about Chrome extensions
+
+Important Notes:
+- Custom icons (icon16.png, icon48.png, icon128.png) will be automatically copied from the template
+- Do NOT generate any PNG image files - focus on functionality and code
+- The extension will use the existing robot icon design
+
+Conversation:
+"""
+_PROMPT_FOOTER = """
+
+If the user wants to create a new extension, call build_extension.
+If the user reports issues or bugs, call fix_extension.
+If the user wants to add features or improvements, call improve_extension.
+If the user asks general questions, call answer_user_question.
+If the user is just chatting or asking for clarification, provide a helpful response without calling any function.
+"""
+
+# Prompt for a conversation with no messages yet
+_EMPTY_CONTEXT_PROMPT = _PROMPT_HEADER + _PROMPT_FOOTER
+
 
 class BuildExtensionRequest(BaseModel):
     """Request model for building a new Chrome extension."""
+    model_config = ConfigDict(frozen=True, extra='forbid')
+    
     requirements: str = Field(..., description="Detailed description of what the user wants the extension to do")
     features: List[str] = Field(default=[], description="List of specific features the extension should have")
     target_websites: List[str] = Field(default=[], description="List of websites the extension should work on")
@@ -17,6 +60,8 @@ class BuildExtensionRequest(BaseModel):
 
 class FixExtensionRequest(BaseModel):
     """Request model for fixing issues in an existing Chrome extension."""
+    model_config = ConfigDict(frozen=True, extra='forbid')
+    
     issues: str = Field(..., description="Description of the issues or bugs to fix")
     error_logs: str = Field(default="", description="Any error logs or debug information available")
     current_behavior: str = Field(default="", description="Description of what the extension is currently doing vs what it should do")
@@ -24,6 +69,8 @@ class FixExtensionRequest(BaseModel):
 
 class ImproveExtensionRequest(BaseModel):
     """Request model for improving an existing Chrome extension."""
+    model_config = ConfigDict(frozen=True, extra='forbid')
+    
     improvements: str = Field(..., description="Description of improvements or new features to add")
     current_features: str = Field(default="", description="Description of current extension features")
     performance_issues: str = Field(default="", description="Any performance issues to address")
@@ -31,6 +78,8 @@ class ImproveExtensionRequest(BaseModel):
 
 class AnswerUserQuestionRequest(BaseModel):
     """Request model for answering general user questions."""
+    model_config = ConfigDict(frozen=True, extra='forbid')
+    
     question: str = Field(..., description="The user's question to answer")
     topic: str = Field(default="chrome extension development", description="The topic area (e.g., 'chrome extension development', 'manifest v3', 'permissions')")
 
@@ -45,34 +94,13 @@ class FunctionCaller:
     
     def create_conversation_context(self, messages: List[ChatMessage]) -> str:
         """Create conversation context for the model."""
-        # Get the last few messages for context
-        recent_messages = messages[-5:] if len(messages) >= 5 else messages
+        if not messages:
+            return _EMPTY_CONTEXT_PROMPT
         
-        conversation = "\n".join([
-            f"{'User' if msg.role == MessageRole.USER else 'Assistant'}: {msg.content}"
-            for msg in recent_messages
-        ])
+        # Get the last few messages for context
+        conversation = "\n".join(
+            ROLE_PREFIX[msg.role] + msg.content
+            for msg in messages[-5:]
+        )
         
-        return f"""
-You are a helpful Chrome extension development assistant. Based on the conversation below, determine which function to call or provide a helpful response.
-
-Available functions:
-- build_extension: Create a new Chrome extension from scratch
-- fix_extension: Fix issues or bugs in an existing extension  
-- improve_extension: Enhance an existing extension with new features
-- answer_user_question: Answer general questions about Chrome extensions
-
-Important Notes:
-- Custom icons (icon16.png, icon48.png, icon128.png) will be automatically copied from the template
-- Do NOT generate any PNG image files - focus on functionality and code
-- The extension will use the existing robot icon design
-
-Conversation:
-{conversation}
-
-If the user wants to create a new extension, call build_extension.
-If the user reports issues or bugs, call fix_extension.
-If the user wants to add features or improvements, call improve_extension.
-If the user asks general questions, call answer_user_question.
-If the user is just chatting or asking for clarification, provide a helpful response without calling any function.
-""" 
\ No newline at end of file
+        return _PROMPT_HEADER + conversation + _PROMPT_FOOTER
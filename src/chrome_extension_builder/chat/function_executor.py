@@ -2,63 +2,126 @@
 Function execution implementation for the chat agent using Pydantic AI.
 """
 
+import asyncio
+import logging
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 
+from pydantic_ai import Agent
+
 from ..models.chat import ChatMessage, MessageRole
 from ..models.extension import Extension
+from . import session_store
+from .function_caller import BUILD_MESSAGE_PREFIX, FIX_MESSAGE_PREFIX, IMPROVE_MESSAGE_PREFIX, ROLE_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# Fixed halves of the general conversation prompt, wrapped around the recent messages
+_CONVERSATION_PROMPT_HEADER = """
+You are a helpful assistant for building Chrome extensions. The user is having a conversation about Chrome extensions.
+
+Conversation history:
+"""
+_CONVERSATION_PROMPT_FOOTER = """
+
+Provide a helpful, conversational response. If they seem to want to create an extension, encourage them to describe what they want to build. Keep responses friendly and informative.
+"""
+
+# Gemini CLI prompt templates for fixing and improving an extension
+_FIX_PROMPT_TMPL = """
+Fix the following issues in the Chrome extension:
+
+**Issues to Fix:**
+{issues}
+
+**Current Behavior:**
+{current_behavior}
+
+**Error Logs:**
+{error_logs}
+
+Please fix the issues and ensure the extension works correctly. Make sure to:
+1. Address all reported issues
+2. Maintain existing functionality
+3. Follow Chrome extension best practices
+4. Test the fixes thoroughly
+"""
+_IMPROVE_PROMPT_TMPL = """
+Improve the Chrome extension with the following enhancements:
+
+**Improvements to Add:**
+{improvements}
+
+**Current Features:**
+{current_features}
+
+**Performance Issues to Address:**
+{performance_issues}
+
+Please enhance the extension with the requested improvements while:
+1. Maintaining existing functionality
+2. Following Chrome extension best practices
+3. Optimizing performance where needed
+4. Adding the new features properly
+"""
 
 
 class FunctionExecutor:
     """Handles execution of specific functions."""
     
-    def __init__(self, model, websocket=None, cli_handler=None):
+    def __init__(self, model, cli_handler=None):
         """Initialize the function executor."""
         self.model = model
-        self.websocket = websocket
         self.cli_handler = cli_handler
+        
+        # Tool-less agent reused for every general conversation turn
+        self._general_agent = Agent(model)
+        
+        # Function name -> handler, looked up once per call
+        self._dispatch = {
+            "build_extension": self._build_extension,
+            "fix_extension": self._fix_extension,
+            "improve_extension": self._improve_extension,
+            "answer_user_question": self._answer_user_question
+        }
+    
+    async def prewarm(self, session_id: str = None):
+        """Prepare session resources that generation needs, independent of the chosen action."""
+        if session_id:
+            await asyncio.to_thread(self.cli_handler.prepare_extension_dir, session_id)
     
     async def execute_function(self, function_name: str, args: Dict[str, Any], 
                              messages: List[ChatMessage], session_id: str = None) -> Dict[str, Any]:
         """Execute the specified function with the given arguments."""
-        print(f"🔧 Executing function: {function_name}")
-        
-        if function_name == "build_extension":
-            return await self._build_extension(args, messages, session_id)
-        elif function_name == "fix_extension":
-            return await self._fix_extension(args, messages, session_id)
-        elif function_name == "improve_extension":
-            return await self._improve_extension(args, messages, session_id)
-        elif function_name == "answer_user_question":
-            return await self._answer_user_question(args, messages, session_id)
-        else:
-            print(f"❌ Unknown function: {function_name}")
+        logger.debug("🔧 Executing function: %s", function_name)
+        
+        handler = self._dispatch.get(function_name)
+        if handler is None:
+            logger.warning("❌ Unknown function: %s", function_name)
             return await self._handle_general_conversation(messages, "Unknown function called")
+        return await handler(args, messages, session_id)
     
     async def _build_extension(self, args: Dict[str, Any], messages: List[ChatMessage], 
                               session_id: str = None) -> Dict[str, Any]:
         """Build a new Chrome extension."""
-        print(f"🏗️ Building new extension...")
+        logger.debug("🏗️ Building new extension...")
         
         # Extract requirements from the args
-        if 'message' in args:
-            # This is from tool output
-            requirements = args.get("message", "").replace("Building extension with requirements: ", "")
-        else:
-            # This is from direct function call
-            requirements = args.get("requirements", "")
+        # Direct calls pass the field itself; tool output only carries the prefixed message
+        requirements = args.get("requirements") or args.get("message", "").removeprefix(BUILD_MESSAGE_PREFIX)
         
         features = args.get("features", [])
         target_websites = args.get("target_websites", [])
         
-        print(f"📝 Requirements: {requirements}")
-        print(f"📝 Features: {features}")
-        print(f"📝 Target websites: {target_websites}")
+        logger.debug("📝 Requirements: %s", requirements)
+        logger.debug("📝 Features: %s", features)
+        logger.debug("📝 Target websites: %s", target_websites)
         
         # Create extension using Gemini CLI
         extension = await self._generate_extension_with_gemini_cli(
             requirements, features, target_websites, messages, session_id
         )
+        await self._stream_extension_summary(extension, session_id)
         
         # Create response message
         features_text = f"\n- Features: {', '.join(features)}" if features else ""
@@ -86,45 +149,27 @@ Would you like me to make any adjustments to the extension or explain any part o
     async def _fix_extension(self, args: Dict[str, Any], messages: List[ChatMessage], 
                             session_id: str = None) -> Dict[str, Any]:
         """Fix issues in an existing Chrome extension."""
-        print(f"🔧 Fixing extension issues...")
+        logger.debug("🔧 Fixing extension issues...")
         
         # Extract issues from the args
-        if 'message' in args:
-            # This is from tool output
-            issues = args.get("message", "").replace("Fixing extension issues: ", "")
-        else:
-            # This is from direct function call
-            issues = args.get("issues", "")
+        # Direct calls pass the field itself; tool output only carries the prefixed message
+        issues = args.get("issues") or args.get("message", "").removeprefix(FIX_MESSAGE_PREFIX)
         
         error_logs = args.get("error_logs", "")
         current_behavior = args.get("current_behavior", "")
         
-        print(f"📝 Issues to fix: {issues}")
+        logger.debug("📝 Issues to fix: %s", issues)
         
         # Create fix prompt for Gemini CLI
-        fix_prompt = f"""
-Fix the following issues in the Chrome extension:
-
-**Issues to Fix:**
-{issues}
-
-**Current Behavior:**
-{current_behavior}
-
-**Error Logs:**
-{error_logs}
-
-Please fix the issues and ensure the extension works correctly. Make sure to:
-1. Address all reported issues
-2. Maintain existing functionality
-3. Follow Chrome extension best practices
-4. Test the fixes thoroughly
-"""
+        fix_prompt = _FIX_PROMPT_TMPL.format(
+            issues=issues, current_behavior=current_behavior, error_logs=error_logs
+        )
         
         # Generate fixed extension
         extension = await self._generate_extension_with_gemini_cli(
             fix_prompt, [], [], messages, session_id, is_fix=True
         )
+        await self._stream_extension_summary(extension, session_id)
         
         assistant_message = f"""I've fixed the issues in your Chrome extension!
 
@@ -151,45 +196,27 @@ Would you like me to explain any of the changes made or help with further improv
     async def _improve_extension(self, args: Dict[str, Any], messages: List[ChatMessage], 
                                 session_id: str = None) -> Dict[str, Any]:
         """Improve an existing Chrome extension."""
-        print(f"🚀 Improving extension...")
+        logger.debug("🚀 Improving extension...")
         
         # Extract improvements from the args
-        if 'message' in args:
-            # This is from tool output
-            improvements = args.get("message", "").replace("Improving extension with: ", "")
-        else:
-            # This is from direct function call
-            improvements = args.get("improvements", "")
+        # Direct calls pass the field itself; tool output only carries the prefixed message
+        improvements = args.get("improvements") or args.get("message", "").removeprefix(IMPROVE_MESSAGE_PREFIX)
         
         current_features = args.get("current_features", "")
         performance_issues = args.get("performance_issues", "")
         
-        print(f"📝 Improvements to add: {improvements}")
+        logger.debug("📝 Improvements to add: %s", improvements)
         
         # Create improvement prompt for Gemini CLI
-        improve_prompt = f"""
-Improve the Chrome extension with the following enhancements:
-
-**Improvements to Add:**
-{improvements}
-
-**Current Features:**
-{current_features}
-
-**Performance Issues to Address:**
-{performance_issues}
-
-Please enhance the extension with the requested improvements while:
-1. Maintaining existing functionality
-2. Following Chrome extension best practices
-3. Optimizing performance where needed
-4. Adding the new features properly
-"""
+        improve_prompt = _IMPROVE_PROMPT_TMPL.format(
+            improvements=improvements, current_features=current_features, performance_issues=performance_issues
+        )
         
         # Generate improved extension
         extension = await self._generate_extension_with_gemini_cli(
             improve_prompt, [], [], messages, session_id, is_improvement=True
         )
+        await self._stream_extension_summary(extension, session_id)
         
         assistant_message = f"""I've improved your Chrome extension with the requested enhancements!
 
@@ -213,10 +240,21 @@ Would you like me to explain any of the new features or help with further enhanc
             "action": "extension_improved"
         }
     
+    async def _stream_extension_summary(self, extension: Extension, session_id: str = None):
+        """Send the extension name and file list ahead of the full reply to the session's WebSockets."""
+        if not session_store.is_connected(session_id):
+            return
+        try:
+            await session_store.send_json(session_id, {"type": "assistant_start", "name": extension.name})
+            await session_store.send_json(session_id, {"type": "files", "names": list(extension.files)})
+            await session_store.send_json(session_id, {"type": "assistant_end"})
+        except Exception as e:
+            logger.warning("⚠️ WebSocket error: %s", e)
+    
     async def _answer_user_question(self, args: Dict[str, Any], messages: List[ChatMessage], 
                                    session_id: str = None) -> Dict[str, Any]:
         """Answer general user questions about Chrome extensions."""
-        print(f"❓ Answering user question...")
+        logger.debug("❓ Answering user question...")
         
         # Extract answer from the args
         if 'answer' in args:
@@ -238,27 +276,18 @@ Would you like me to explain any of the new features or help with further enhanc
     
     async def _handle_general_conversation(self, messages: List[ChatMessage], user_message: str) -> Dict[str, Any]:
         """Handle general conversation when no specific function is needed."""
-        print(f"💭 Handling general conversation...")
+        logger.debug("💭 Handling general conversation...")
         
         # Create conversation context
-        conversation = "\n".join([
-            f"{'User' if msg.role == MessageRole.USER else 'Assistant'}: {msg.content}"
+        conversation = "\n".join(
+            ROLE_PREFIX[msg.role] + msg.content
             for msg in messages[-3:]  # Last 3 messages for context
-        ])
+        )
         
-        prompt = f"""
-You are a helpful assistant for building Chrome extensions. The user is having a conversation about Chrome extensions.
-
-Conversation history:
-{conversation}
-
-Provide a helpful, conversational response. If they seem to want to create an extension, encourage them to describe what they want to build. Keep responses friendly and informative.
-"""
+        prompt = _CONVERSATION_PROMPT_HEADER + conversation + _CONVERSATION_PROMPT_FOOTER
         
         # Use the model directly for general conversation
-        from pydantic_ai import Agent
-        temp_agent = Agent(self.model)
-        result = await temp_agent.run(prompt)
+        result = await self._general_agent.run(prompt)
         answer = str(result.output) if hasattr(result, 'output') else "I'm here to help with Chrome extension development!"
         messages.append(ChatMessage(role=MessageRole.ASSISTANT, content=answer))
         
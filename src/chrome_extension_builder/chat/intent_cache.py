@@ -0,0 +1,75 @@
+"""
+Similarity cache for intent analysis results.
+"""
+
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+_WORD_RE = re.compile(r"\w+")
+
+# Bag-of-terms vector paired with its Euclidean norm
+_Vector = Tuple[Counter, float]
+
+
+def _vector(terms: Iterable[Hashable]) -> _Vector:
+    """Count terms and compute the norm of the resulting vector."""
+    counts = Counter(terms)
+    return counts, math.sqrt(sum(count * count for count in counts.values()))
+
+
+def _cosine(a: _Vector, b: _Vector) -> float:
+    """Cosine similarity of two vectors, zero when either is empty."""
+    if not a[1] or not b[1]:
+        return 0.0
+    return sum(count * b[0][term] for term, count in a[0].items()) / (a[1] * b[1])
+
+
+class IntentCache:
+    """LRU cache that returns intent results for near-duplicate user messages in the same context."""
+
+    def __init__(self, max_entries: int = 256, threshold: float = 0.9):
+        """Initialize the intent cache."""
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[_Vector, _Vector, Dict[str, Any]]]" = OrderedDict()
+
+    @staticmethod
+    def _embed(text: str) -> Tuple[str, _Vector, _Vector]:
+        """Embed text as a normalized key plus word and bigram vectors."""
+        words = _WORD_RE.findall(text.lower())
+        return " ".join(words), _vector(words), _vector(zip(words, words[1:]))
+
+    def get(self, text: str, context: str = "") -> Optional[Dict[str, Any]]:
+        """Return the cached intent for the most similar message above the threshold with the same context."""
+        key, words, bigrams = self._embed(text)
+        if not words[1]:
+            return None
+
+        best_key, best_sim = None, self.threshold
+        if (context, key) in self._entries:
+            best_key = (context, key)
+        else:
+            for cached_key, (cached_words, cached_bigrams, _) in self._entries.items():
+                if cached_key[0] != context:
+                    continue
+                # Word overlap alone ignores order, so the bigrams must match as closely
+                sim = min(_cosine(words, cached_words), _cosine(bigrams, cached_bigrams))
+                if sim >= best_sim:
+                    best_key, best_sim = cached_key, sim
+
+        if best_key is None:
+            return None
+        self._entries.move_to_end(best_key)
+        return dict(self._entries[best_key][2])
+
+    def put(self, text: str, intent_data: Dict[str, Any], context: str = ""):
+        """Store the intent for a message in a context, evicting the least recently used entry."""
+        key, words, bigrams = self._embed(text)
+        if not words[1]:
+            return
+        self._entries[(context, key)] = (words, bigrams, dict(intent_data))
+        self._entries.move_to_end((context, key))
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -2,7 +2,7 @@
 Structured output models for function responses using Pydantic AI.
 """
 
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -36,4 +36,19 @@ class ConversationResponse(BaseModel):
     """Structured response for general conversation."""
     response: str = Field(..., description="The conversational response")
     suggested_actions: Optional[List[str]] = Field(None, description="Suggested next actions")
-    needs_clarification: bool = Field(False, description="Whether the response needs clarification") 
\ No newline at end of file
+    needs_clarification: bool = Field(False, description="Whether the response needs clarification") 
+
+
+class IntentAnalysis(BaseModel):
+    """Structured response for user intent analysis."""
+    action: Literal[
+        "build_extension",
+        "improve_extension",
+        "fix_extension",
+        "debug_analysis",
+        "clarification_needed",
+        "general_conversation",
+    ] = Field(..., description="The action to take")
+    confidence: float = Field(..., description="How confident the analysis is, from 0.0 to 1.0")
+    reasoning: str = Field(..., description="Brief explanation of the decision")
+    needs_clarification: bool = Field(False, description="Whether the user needs to provide more details")
@@ -2,39 +2,58 @@
 Chat routes for Chrome Extension Builder.
 """
 
+import functools
+import hashlib
+import logging
 import uuid
-from datetime import datetime
-from typing import List, Dict, Any
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.responses import HTMLResponse
-from pydantic import BaseModel
 
+from .._json import dumps
 from ..models.chat import ChatSession, ChatMessage, MessageRole
 from ..chat.agent import ChatAgent
+from ..chat import session_store
+from ..chat.schemas import ExtensionRead, MessageRequest
 
 router = APIRouter()
 
-# In-memory storage for chat sessions
-chat_sessions: Dict[str, ChatSession] = {}
+logger = logging.getLogger(__name__)
 
 # Import extensions dictionary from api routes
 from ..api.routes import extensions
 
-# Global chat agent instance
-_chat_agent = None
 
+def _file_manifest(files: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Describe extension files by name, size and content hash instead of their contents."""
+    return [
+        {"name": name, "size": len(content), "sha1": hashlib.sha1(content.encode()).hexdigest()}
+        for name, content in files.items()
+    ]
 
-class MessageRequest(BaseModel):
-    """Request model for sending a message."""
-    message: str
 
+def _finalize_extension(result: Dict[str, Any], inline_files: bool = True) -> Optional[Dict[str, Any]]:
+    """Store the result's extension, if any, and return its on-wire representation."""
+    extension = result.get("extension")
+    if not extension:
+        return None
+    
+    # Store the extension in the global extensions dictionary
+    extensions[extension.id] = extension
+    logger.debug("💾 Stored extension '%s' with ID: %s", extension.name, extension.id)
+    
+    if inline_files:
+        return ExtensionRead.model_validate(extension).model_dump(mode='json')
+    extension_dict = ExtensionRead.model_validate(extension).model_dump(mode='json', exclude={'files'})
+    extension_dict["files"] = _file_manifest(extension.files)
+    return extension_dict
 
-def get_chat_agent():
+
+@functools.cache
+def get_chat_agent() -> ChatAgent:
     """Get or create the ChatAgent instance."""
-    global _chat_agent
-    if _chat_agent is None:
-        _chat_agent = ChatAgent()
-    return _chat_agent
+    return ChatAgent()
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -48,45 +67,49 @@ async def get_chat_interface():
 async def create_chat_session():
     """Create a new chat session."""
     session_id = str(uuid.uuid4())
-    session = ChatSession(
+    now = datetime.now(timezone.utc)
+    # Server-generated fields only, so skip validation
+    session = ChatSession.model_construct(
         id=session_id,
         messages=[],
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
+        created_at=now,
+        updated_at=now
     )
-    chat_sessions[session_id] = session
+    session_store.put(session)
     return session
 
 
 @router.get("/sessions/{session_id}", response_model=ChatSession)
 async def get_chat_session(session_id: str):
     """Get a chat session by ID."""
-    if session_id not in chat_sessions:
+    session = session_store.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Chat session not found")
-    return chat_sessions[session_id]
+    return session
 
 
 @router.post("/sessions/{session_id}/messages")
 async def send_message(session_id: str, request: MessageRequest):
     """Send a message in a chat session."""
-    print(f"📨 Received message request for session: {session_id}")
+    logger.debug("📨 Received message request for session: %s", session_id)
     
-    if session_id not in chat_sessions:
-        print(f"❌ Session not found: {session_id}")
+    session = session_store.get(session_id)
+    if session is None:
+        logger.warning("❌ Session not found: %s", session_id)
         raise HTTPException(status_code=404, detail="Chat session not found")
     
-    session = chat_sessions[session_id]
-    print(f"✅ Session found, processing message...")
+    logger.debug("✅ Session found, processing message...")
     
-    # Create a proper ChatMessage object
-    user_message = ChatMessage(
+    # Create a proper ChatMessage object; the request body is already validated
+    user_message = ChatMessage.model_construct(
+        id=uuid.uuid4().hex,
         role=MessageRole.USER,
         content=request.message,
         session_id=session_id
     )
     
     # Process the message using the ChatAgent
-    print(f"🤖 Sending to ChatAgent for processing...")
+    logger.debug("🤖 Sending to ChatAgent for processing...")
     chat_agent = get_chat_agent()
     result = await chat_agent.process_message(session.messages, request.message, session_id)
     
@@ -94,27 +117,12 @@ async def send_message(session_id: str, request: MessageRequest):
     session.messages.append(user_message)
     
     # Update session
-    session.updated_at = datetime.utcnow()
+    session.updated_at = datetime.now(timezone.utc)
     
-    print(f"✅ Message processed successfully. Action: {result.get('action', 'unknown')}")
+    logger.debug("✅ Message processed successfully. Action: %s", result.get('action', 'unknown'))
     
     # Store generated extension in extensions dictionary
-    extension_dict = None
-    if result.get("extension"):
-        extension = result.get("extension")
-        # Store the extension in the global extensions dictionary
-        extensions[extension.id] = extension
-        print(f"💾 Stored extension '{extension.name}' with ID: {extension.id}")
-        
-        extension_dict = {
-            "id": extension.id,
-            "name": extension.name,
-            "description": extension.description,
-            "version": extension.manifest.version if extension.manifest else "1.0.0",
-            "files": extension.files,
-            "created_at": extension.created_at.isoformat() if extension.created_at else None,
-            "updated_at": extension.updated_at.isoformat() if extension.updated_at else None
-        }
+    extension_dict = _finalize_extension(result)
     
     return {
         "session_id": session_id,
@@ -127,75 +135,64 @@ async def send_message(session_id: str, request: MessageRequest):
 @router.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """WebSocket endpoint for real-time chat."""
-    print(f"🔌 WebSocket connection request for session: {session_id}")
+    logger.debug("🔌 WebSocket connection request for session: %s", session_id)
     await websocket.accept()
-    print(f"✅ WebSocket connection established for session: {session_id}")
+    logger.debug("✅ WebSocket connection established for session: %s", session_id)
     
-    if session_id not in chat_sessions:
-        print(f"❌ Session not found for WebSocket: {session_id}")
+    session = session_store.get(session_id)
+    if session is None:
+        logger.warning("❌ Session not found for WebSocket: %s", session_id)
         await websocket.close(code=4004, reason="Session not found")
         return
     
-    session = chat_sessions[session_id]
-    print(f"✅ Session found for WebSocket, ready for messages")
+    logger.debug("✅ Session found for WebSocket, ready for messages")
+    session_store.add_connection(session_id, websocket)
     
     try:
         while True:
             # Receive message from client
-            print(f"📥 Waiting for WebSocket message from session: {session_id}")
+            logger.debug("📥 Waiting for WebSocket message from session: %s", session_id)
             data = await websocket.receive_text()
-            print(f"📨 Received WebSocket message: {data[:100]}{'...' if len(data) > 100 else ''}")
+            logger.debug("📨 Received WebSocket message (%d chars)", len(data))
             
-            # Create a proper ChatMessage object
-            user_message = ChatMessage(
+            # Create a proper ChatMessage object; receive_text already guarantees a str
+            user_message = ChatMessage.model_construct(
+                id=uuid.uuid4().hex,
                 role=MessageRole.USER,
                 content=data,
                 session_id=session_id
             )
             
             # Process the message using the ChatAgent
-            print(f"🤖 Processing WebSocket message with ChatAgent...")
+            logger.debug("🤖 Processing WebSocket message with ChatAgent...")
             chat_agent = get_chat_agent()
-            # Set WebSocket for streaming
-            chat_agent.websocket = websocket
+            # Streaming output reaches this socket through the session's connections
             result = await chat_agent.process_message(session.messages, data, session_id)
             
             # Add the user message to the session
             session.messages.append(user_message)
             
             # Update session
-            session.updated_at = datetime.utcnow()
+            session.updated_at = datetime.now(timezone.utc)
             
-            # Store generated extension in extensions dictionary
-            extension_dict = None
-            if result.get("extension"):
-                extension = result.get("extension")
-                # Store the extension in the global extensions dictionary
-                extensions[extension.id] = extension
-                print(f"💾 Stored extension '{extension.name}' with ID: {extension.id}")
-                
-                extension_dict = {
-                    "id": extension.id,
-                    "name": extension.name,
-                    "description": extension.description,
-                    "version": extension.manifest.version if extension.manifest else "1.0.0",
-                    "files": extension.files,
-                    "created_at": extension.created_at.isoformat() if extension.created_at else None,
-                    "updated_at": extension.updated_at.isoformat() if extension.updated_at else None
-                }
+            # Store generated extension in extensions dictionary; file bodies are
+            # fetched separately from /api/extensions/{id}/files/{name}
+            extension_dict = _finalize_extension(result, inline_files=False)
             
             # Send response back to client
-            print(f"📤 Sending WebSocket response...")
-            await websocket.send_json({
+            logger.debug("📤 Sending WebSocket response...")
+            await session_store.broadcast(session_id, dumps({
                 "type": "message",
                 "content": result["response"],
                 "action": result["action"],
                 "extension": extension_dict
-            })
-            print(f"✅ WebSocket response sent successfully")
+            }))
+            logger.debug("✅ WebSocket response sent successfully")
             
     except WebSocketDisconnect:
-        print(f"🔌 WebSocket disconnected for session {session_id}")
+        logger.debug("🔌 WebSocket disconnected for session %s", session_id)
     except Exception as e:
-        print(f"❌ WebSocket error for session {session_id}: {e}")
-        await websocket.close() 
\ No newline at end of file
+        logger.error("❌ WebSocket error for session %s: %s", session_id, e)
+        await websocket.close()
+    finally:
+        session_store.remove_connection(session_id, websocket)
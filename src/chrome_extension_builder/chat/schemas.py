@@ -0,0 +1,28 @@
+"""
+Request and response models for the chat routes.
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class MessageRequest(BaseModel):
+    """Request model for sending a message."""
+    model_config = ConfigDict(extra='forbid', frozen=False)
+    
+    message: str
+
+
+class ExtensionRead(BaseModel):
+    """Extension fields returned to the chat client."""
+    model_config = ConfigDict(from_attributes=True)
+    
+    id: str
+    name: str
+    description: str
+    version: str
+    files: Dict[str, str]
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
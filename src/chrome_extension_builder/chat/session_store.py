@@ -0,0 +1,78 @@
+"""
+Bounded in-memory storage for chat sessions and their WebSocket connections.
+"""
+
+import asyncio
+import os
+from collections import OrderedDict, defaultdict
+from typing import Any, DefaultDict, Dict, Optional
+from weakref import WeakSet
+
+from fastapi import WebSocket
+from starlette.websockets import WebSocketState
+
+from .._json import dumps
+from ..models.chat import ChatSession
+
+# Maximum number of chat sessions kept before the least recently used is evicted
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1024"))
+
+# Chat sessions ordered from least to most recently used
+SESSIONS: "OrderedDict[str, ChatSession]" = OrderedDict()
+
+# Open WebSocket connections per session
+active_connections: DefaultDict[str, "WeakSet[WebSocket]"] = defaultdict(WeakSet)
+
+
+def get(session_id: str) -> Optional[ChatSession]:
+    """Return a session by ID and mark it as recently used."""
+    session = SESSIONS.get(session_id)
+    if session is not None:
+        SESSIONS.move_to_end(session_id)
+    return session
+
+
+def put(session: ChatSession):
+    """Store a session, evicting the least recently used ones beyond MAX_SESSIONS."""
+    SESSIONS[session.id] = session
+    SESSIONS.move_to_end(session.id)
+    while len(SESSIONS) > MAX_SESSIONS:
+        SESSIONS.popitem(last=False)
+
+
+def add_connection(session_id: str, websocket: WebSocket):
+    """Register an open WebSocket for a session."""
+    active_connections[session_id].add(websocket)
+
+
+def remove_connection(session_id: str, websocket: WebSocket):
+    """Unregister a WebSocket, dropping the session entry once it has no connections."""
+    connections = active_connections.get(session_id)
+    if connections is None:
+        return
+    connections.discard(websocket)
+    if not connections:
+        del active_connections[session_id]
+
+
+def is_connected(session_id: Optional[str]) -> bool:
+    """Whether the session has at least one open WebSocket."""
+    return any(
+        websocket.application_state == WebSocketState.CONNECTED
+        for websocket in active_connections.get(session_id, ())
+    )
+
+
+async def send_json(session_id: str, payload: Dict[str, Any]):
+    """Serialize a payload once and send it to every connected WebSocket of a session."""
+    await broadcast(session_id, dumps(payload))
+
+
+async def broadcast(session_id: str, payload: str):
+    """Send an already-serialized payload to every connected WebSocket of a session at once."""
+    peers = [
+        websocket for websocket in active_connections.get(session_id, ())
+        if websocket.application_state == WebSocketState.CONNECTED
+    ]
+    # A dead or slow peer must not block or break delivery to the others
+    await asyncio.gather(*(websocket.send_text(payload) for websocket in peers), return_exceptions=True)
@@ -2,15 +2,173 @@
 AI code generation agent for Chrome extensions.
 """
 
+import asyncio
+import functools
+import hashlib
 import os
 import json
-from typing import Dict, List, Optional, Any
+import random
+import re
+import uuid
+from datetime import datetime, timezone
+from weakref import WeakKeyDictionary
+from typing import Callable, Dict, List, Optional, Any, Tuple
+import google.generativeai as genai
 from google.generativeai import GenerativeModel
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
+from google.api_core.exceptions import ResourceExhausted, ServerError
 
+from .._json import dumps as _json_dumps, loads as _json_loads
 from ..models.extension import Extension, ExtensionManifest
 from ..models.chat import ChatMessage, MessageRole
 
+# Maximum number of Gemini responses kept in the per-agent cache
+RESPONSE_CACHE_SIZE = 256
+
+# Gemini model and sampling settings used for all code generation
+MODEL_NAME = "gemini-pro"
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.8,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+}
+
+# Longest wait for the first or next streamed chunk of a Gemini reply, and the attempt count;
+# transient failures are retried with jittered backoff
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "30"))
+REQUEST_MAX_ATTEMPTS = 4
+_RETRYABLE_ERRORS = (asyncio.TimeoutError, ServerError, ResourceExhausted)
+
+# Path-like tokens in user feedback, matched whole against extension filenames
+_PATH_TOKEN_RE = re.compile(r"[\w./-]+")
+
+# In-flight Gemini requests allowed per API key, shared by every agent using that key
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+
+# Semaphores per event loop and API key; created lazily because on Python 3.9 a
+# Semaphore binds to the current loop when it is constructed
+_SEMAPHORES: "WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = WeakKeyDictionary()
+
+# Model identity appended to prompts when hashing them for the response cache
+_CACHE_SALT = MODEL_NAME + json.dumps(GENERATION_CONFIG, sort_keys=True)
+
+# Safety thresholds applied to every generation request
+_SAFETY_SETTINGS = {
+    HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+    HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+    HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+}
+
+# Prompt templates, filled with %-formatting so literal JSON braces need no escaping
+_ANALYZE_TMPL = """
+Analyze the following user requirements for a Chrome extension and extract key information:
+
+User Requirements:
+%s
+
+Please provide a JSON response with the following structure:
+{
+    "name": "Extension name",
+    "description": "Extension description",
+    "permissions": ["list", "of", "required", "permissions"],
+    "host_permissions": ["list", "of", "host", "permissions"],
+    "features": ["list", "of", "main", "features"],
+    "content_scripts": ["list", "of", "content", "script", "files"],
+    "background_scripts": ["list", "of", "background", "script", "files"],
+    "popup_files": ["list", "of", "popup", "files"],
+    "action_type": "popup|background|content_script"
+}
+"""
+
+_MANIFEST_TMPL = """
+Generate a Chrome extension manifest.json file based on these requirements:
+%s
+
+Return only the JSON manifest object, no additional text.
+"""
+
+# Shared requirements prefix first, per-file instructions last, so file requests share a prefix
+_FILES_PREFIX_TMPL = """
+You generate files for a Chrome extension with these requirements:
+%s
+"""
+
+_FILE_TMPL = _FILES_PREFIX_TMPL + """
+File: %s
+Type: %s
+
+Generate the complete %s file content. Return only the code, no explanations.
+"""
+
+_FILES_BATCH_TMPL = _FILES_PREFIX_TMPL + """
+Files:
+%s
+
+Return only a JSON object whose keys are the filenames and whose values are the complete file contents, no additional text.
+"""
+
+_IMPROVE_TMPL = """
+Improve this Chrome extension based on the following feedback:
+
+Current Extension:
+%s
+
+User Feedback:
+%s
+
+Return the improved extension as JSON with the same structure.
+"""
+
+_IMPROVE_FILES_TMPL = """
+Improve this Chrome extension based on the following feedback:
+
+Manifest:
+%s
+
+Relevant Files:
+%s
+
+User Feedback:
+%s
+
+Return only a JSON object whose keys are filenames and whose values are the complete updated contents, including only the files you modified.
+"""
+
+
+@functools.lru_cache(maxsize=1)
+def _get_model(api_key: str) -> GenerativeModel:
+    """Build the Gemini model once per API key so its client connection stays warm."""
+    genai.configure(api_key=api_key)
+    return GenerativeModel(
+        model_name=MODEL_NAME,
+        generation_config=GENERATION_CONFIG,
+        safety_settings=_SAFETY_SETTINGS,
+    )
+
+
+def _get_semaphore(api_key: str) -> asyncio.Semaphore:
+    """Return the concurrency cap for an API key in the running loop, creating it on first use."""
+    per_loop = _SEMAPHORES.setdefault(asyncio.get_running_loop(), {})
+    semaphore = per_loop.get(api_key)
+    if semaphore is None:
+        semaphore = per_loop[api_key] = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+    return semaphore
+
+
+def _parse_json_object(text: str) -> Dict[str, Any]:
+    """Parse a reply that must be a JSON object."""
+    data = _json_loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    return data
+
+
+def _parse_manifest(text: str) -> ExtensionManifest:
+    """Parse and validate a manifest reply."""
+    return ExtensionManifest.model_validate(_json_loads(text))
+
 
 class CodeGenerationAgent:
     """AI agent for generating Chrome extension code."""
@@ -25,22 +183,59 @@ class CodeGenerationAgent:
                 "in your .env file or pass it as a parameter."
             )
         
-        # Configure the model
-        self.model = GenerativeModel(
-            model_name="gemini-pro",
-            generation_config={
-                "temperature": 0.7,
-                "top_p": 0.8,
-                "top_k": 40,
-                "max_output_tokens": 8192,
-            },
-            safety_settings={
-                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-            },
+        # Configure the model, shared by every agent using the same key
+        self.model = _get_model(self.api_key)
+        
+        # Responses keyed by a hash of the prompt and the model configuration
+        self._cache: Dict[str, str] = {}
+    
+    async def _cached_generate(self, prompt: str, parse: Optional[Callable[[str], Any]] = None) -> Any:
+        """Generate text for a prompt, reusing the response for a prompt seen before.
+        
+        With ``parse``, the parsed reply is returned and only replies that parse are cached,
+        so a malformed reply is requested again next time instead of being replayed.
+        """
+        key = hashlib.sha256((prompt + _CACHE_SALT).encode()).hexdigest()
+        if key in self._cache:
+            text = self._cache[key]
+            return parse(text) if parse is not None else text
+        
+        for attempt in range(REQUEST_MAX_ATTEMPTS):
+            try:
+                # Cap in-flight Gemini requests per key to stay under the rate limit
+                async with _get_semaphore(self.api_key):
+                    text = await self._stream_generate(prompt)
+                break
+            except _RETRYABLE_ERRORS:
+                if attempt == REQUEST_MAX_ATTEMPTS - 1:
+                    raise
+                # Back off outside the semaphore so other requests can use the slot
+                await asyncio.sleep(0.5 * 2 ** attempt + random.random() * 0.25)
+        
+        result = parse(text) if parse is not None else text
+        if len(self._cache) >= RESPONSE_CACHE_SIZE:
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[key] = text
+        return result
+    
+    async def _stream_generate(self, prompt: str) -> str:
+        """Stream the completion for a prompt, timing out only when the reply stalls.
+        
+        The timeout bounds the wait for the first chunk and between chunks, so long replies
+        that keep streaming are not cut off.
+        """
+        response = await asyncio.wait_for(
+            self.model.generate_content_async(prompt, stream=True), REQUEST_TIMEOUT_SECONDS
         )
+        chunks = response.__aiter__()
+        parts = []
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), REQUEST_TIMEOUT_SECONDS)
+            except StopAsyncIteration:
+                break
+            parts.append(chunk.text)
+        return "".join(parts)
     
     async def analyze_requirements(self, messages: List[ChatMessage]) -> Dict[str, Any]:
         """Analyze chat messages to extract extension requirements."""
@@ -48,30 +243,9 @@ class CodeGenerationAgent:
         user_messages = [msg.content for msg in messages if msg.role == MessageRole.USER]
         combined_content = "\n".join(user_messages)
         
-        prompt = f"""
-        Analyze the following user requirements for a Chrome extension and extract key information:
-        
-        User Requirements:
-        {combined_content}
-        
-        Please provide a JSON response with the following structure:
-        {{
-            "name": "Extension name",
-            "description": "Extension description",
-            "permissions": ["list", "of", "required", "permissions"],
-            "host_permissions": ["list", "of", "host", "permissions"],
-            "features": ["list", "of", "main", "features"],
-            "content_scripts": ["list", "of", "content", "script", "files"],
-            "background_scripts": ["list", "of", "background", "script", "files"],
-            "popup_files": ["list", "of", "popup", "files"],
-            "action_type": "popup|background|content_script"
-        }}
-        """
-        
-        response = await self.model.generate_content_async(prompt)
         try:
-            return json.loads(response.text)
-        except json.JSONDecodeError:
+            return await self._cached_generate(_ANALYZE_TMPL % combined_content, _parse_json_object)
+        except ValueError:
             # Fallback to basic extraction
             return {
                 "name": "Chrome Extension",
@@ -85,20 +259,13 @@ class CodeGenerationAgent:
                 "action_type": "popup"
             }
     
-    async def generate_manifest(self, requirements: Dict[str, Any]) -> ExtensionManifest:
+    async def generate_manifest(self, requirements: Dict[str, Any],
+                                requirements_json: Optional[str] = None) -> ExtensionManifest:
         """Generate a Chrome extension manifest based on requirements."""
-        prompt = f"""
-        Generate a Chrome extension manifest.json file based on these requirements:
-        {json.dumps(requirements, indent=2)}
-        
-        Return only the JSON manifest object, no additional text.
-        """
-        
-        response = await self.model.generate_content_async(prompt)
+        prompt = _MANIFEST_TMPL % (requirements_json or _json_dumps(requirements))
         try:
-            manifest_data = json.loads(response.text)
-            return ExtensionManifest(**manifest_data)
-        except (json.JSONDecodeError, Exception):
+            return await self._cached_generate(prompt, _parse_manifest)
+        except ValueError:
             # Fallback to basic manifest
             return ExtensionManifest(
                 name=requirements.get("name", "Chrome Extension"),
@@ -107,62 +274,85 @@ class CodeGenerationAgent:
                 host_permissions=requirements.get("host_permissions", [])
             )
     
-    async def generate_file_content(self, filename: str, requirements: Dict[str, Any], file_type: str) -> str:
+    async def generate_file_content(self, filename: str, requirements: Dict[str, Any], file_type: str,
+                                    requirements_json: Optional[str] = None) -> str:
         """Generate content for a specific file."""
-        prompt = f"""
-        Generate a {file_type} file for a Chrome extension with these requirements:
-        {json.dumps(requirements, indent=2)}
+        prompt = _FILE_TMPL % (requirements_json or _json_dumps(requirements), filename, file_type, file_type)
+        return await self._cached_generate(prompt)
+    
+    async def _generate_named_file(self, filename: str, requirements: Dict[str, Any], file_type: str,
+                                   requirements_json: Optional[str] = None) -> Tuple[str, str]:
+        """Generate content for a file and return it paired with the filename."""
+        return filename, await self.generate_file_content(filename, requirements, file_type, requirements_json)
+    
+    async def generate_all_files(self, requirements: Dict[str, Any], file_specs: List[Tuple[str, str]],
+                                 requirements_json: Optional[str] = None) -> Dict[str, str]:
+        """Generate several files with a single request, falling back to one request per missing file."""
+        if not file_specs:
+            return {}
         
-        File: {filename}
-        Type: {file_type}
+        # Serialize the requirements once for the batched prompt and any per-file fallbacks
+        requirements_json = requirements_json or _json_dumps(requirements)
+        file_lines = "\n".join(f"- {filename} ({file_type})" for filename, file_type in file_specs)
+        prompt = _FILES_BATCH_TMPL % (requirements_json, file_lines)
+        try:
+            generated = await self._cached_generate(prompt, _parse_json_object)
+        except (ValueError, *_RETRYABLE_ERRORS):
+            # Invalid JSON or a batched request that kept failing: generate every file separately
+            generated = {}
         
-        Generate the complete file content. Return only the code, no explanations.
-        """
+        # Generate anything the batched response missed concurrently, one file per request
+        missing = [
+            (filename, file_type) for filename, file_type in file_specs
+            if not isinstance(generated.get(filename), str)
+        ]
+        tasks = [
+            asyncio.create_task(self._generate_named_file(filename, requirements, file_type, requirements_json))
+            for filename, file_type in missing
+        ]
+        try:
+            # Store each file as soon as its request completes rather than after the slowest one
+            for next_file in asyncio.as_completed(tasks):
+                filename, content = await next_file
+                generated[filename] = content
+        except BaseException:
+            # Stop the remaining requests and retrieve their results so none is left running
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
         
-        response = await self.model.generate_content_async(prompt)
-        return response.text
+        return {filename: generated[filename] for filename, _ in file_specs}
     
     async def generate_extension(self, messages: List[ChatMessage]) -> Extension:
         """Generate a complete Chrome extension from chat messages."""
         # Analyze requirements
         requirements = await self.analyze_requirements(messages)
         
-        # Generate manifest
-        manifest = await self.generate_manifest(requirements)
+        # Serialize the requirements once for every prompt that embeds them
+        requirements_json = _json_dumps(requirements)
         
-        # Generate files
-        files = {}
+        # Generate the manifest in the background while the files are generated
+        manifest_task = asyncio.create_task(self.generate_manifest(requirements, requirements_json))
         
-        # Generate popup HTML if needed
+        # Generate all files in one request
+        file_specs = []
         if requirements.get("action_type") == "popup":
-            popup_html = await self.generate_file_content(
-                "popup.html", requirements, "HTML"
-            )
-            files["popup.html"] = popup_html
-            
-            popup_css = await self.generate_file_content(
-                "popup.css", requirements, "CSS"
-            )
-            files["popup.css"] = popup_css
-            
-            popup_js = await self.generate_file_content(
-                "popup.js", requirements, "JavaScript"
-            )
-            files["popup.js"] = popup_js
-        
-        # Generate content scripts
-        for script in requirements.get("content_scripts", []):
-            content = await self.generate_file_content(script, requirements, "JavaScript")
-            files[script] = content
+            file_specs += [("popup.html", "HTML"), ("popup.css", "CSS"), ("popup.js", "JavaScript")]
+        file_specs += [(script, "JavaScript") for script in requirements.get("content_scripts", [])]
+        file_specs += [(script, "JavaScript") for script in requirements.get("background_scripts", [])]
         
-        # Generate background scripts
-        for script in requirements.get("background_scripts", []):
-            content = await self.generate_file_content(script, requirements, "JavaScript")
-            files[script] = content
+        try:
+            files = await self.generate_all_files(requirements, file_specs, requirements_json)
+        except BaseException:
+            # Do not leave the manifest request holding a semaphore slot with an unretrieved result
+            manifest_task.cancel()
+            raise
+        manifest = await manifest_task
         
         # Create extension object
         extension = Extension(
-            id=f"ext_{len(files)}",  # Simple ID generation
+            id=uuid.uuid4().hex,
             name=requirements.get("name", "Chrome Extension"),
             description=requirements.get("description", "A Chrome extension"),
             manifest=manifest,
@@ -173,21 +363,50 @@ class CodeGenerationAgent:
     
     async def improve_extension(self, extension: Extension, feedback: str) -> Extension:
         """Improve an extension based on user feedback."""
-        prompt = f"""
-        Improve this Chrome extension based on the following feedback:
+        # Send only the files the feedback mentions and ask for just the changed ones back
+        # Whole tokens only, so "content.js" does not select "content.js.map"; trailing sentence dots are dropped
+        tokens = {token.rstrip(".") for token in _PATH_TOKEN_RE.findall(feedback.lower())}
+        tokens |= {token.rsplit("/", 1)[-1] for token in tokens}
+        referenced = {
+            filename: content for filename, content in extension.files.items()
+            if filename.lower() in tokens or filename.rsplit("/", 1)[-1].lower() in tokens
+        }
+        if referenced:
+            return await self._improve_extension_files(extension, feedback, referenced)
         
-        Current Extension:
-        {json.dumps(extension.dict(), indent=2)}
-        
-        User Feedback:
-        {feedback}
+        prompt = _IMPROVE_TMPL % (extension.model_dump_json(), feedback)
+        try:
+            return await self._cached_generate(prompt, Extension.model_validate_json)
+        except ValueError:
+            return extension  # Return original if improvement fails
+    
+    async def _improve_extension_files(self, extension: Extension, feedback: str, files: Dict[str, str]) -> Extension:
+        """Improve selected files and merge the returned {filename: content} patch into the extension."""
+        prompt = _IMPROVE_FILES_TMPL % (extension.manifest.model_dump_json(), _json_dumps(files), feedback)
+        try:
+            patch = await self._cached_generate(prompt, _parse_json_object)
+        except ValueError:
+            return extension  # Return original if improvement fails
         
-        Return the improved extension as JSON with the same structure.
-        """
+        # A returned manifest.json replaces the manifest model and, when the extension also
+        # keeps the manifest as a file (CLI-generated ones do), that file's full text
+        manifest = extension.manifest
+        manifest_patch = patch.pop("manifest.json", None)
+        if manifest_patch is not None:
+            try:
+                if isinstance(manifest_patch, str):
+                    manifest = _parse_manifest(manifest_patch)
+                else:
+                    manifest = ExtensionManifest.model_validate(manifest_patch)
+                    manifest_patch = json.dumps(manifest_patch, indent=2)
+            except ValueError:
+                manifest_patch = None  # Keep the current manifest if the returned one is invalid
         
-        response = await self.model.generate_content_async(prompt)
-        try:
-            improved_data = json.loads(response.text)
-            return Extension(**improved_data)
-        except (json.JSONDecodeError, Exception):
-            return extension  # Return original if improvement fails 
\ No newline at end of file
+        patch = {filename: content for filename, content in patch.items() if isinstance(content, str)}
+        if manifest_patch is not None and "manifest.json" in extension.files:
+            patch["manifest.json"] = manifest_patch
+        return extension.model_copy(update={
+            "manifest": manifest,
+            "files": {**extension.files, **patch},
+            "updated_at": datetime.now(timezone.utc),
+        })
@@ -2,10 +2,15 @@
 Main application entry point for Chrome Extension Builder.
 """
 
+import hashlib
+import logging
+import mimetypes
 import os
+import queue
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.templating import Jinja2Templates
 from dotenv import load_dotenv
 from pathlib import Path
@@ -32,15 +37,49 @@ elif os.getenv("GEMINI_API_KEY") and not os.getenv("GOOGLE_API_KEY"):
 print(f"Environment loaded - GOOGLE_API_KEY: {'✓' if os.getenv('GOOGLE_API_KEY') else '✗'}")
 print(f"Environment loaded - GEMINI_API_KEY: {'✓' if os.getenv('GEMINI_API_KEY') else '✗'}")
 
+# Route log records through a queue so request handlers never block on console I/O
+_log_queue = queue.SimpleQueue()
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(_log_queue)])
+_log_listener = QueueListener(_log_queue, logging.StreamHandler())
+
+# Static assets served from memory; URLs are not fingerprinted, so clients revalidate with the ETag
+STATIC_DIR = Path("src/chrome_extension_builder/static")
+STATIC_CACHE_CONTROL = "public, no-cache"
+
+# Relative asset path -> (content, ETag, media type), filled at startup
+_static_assets: Dict[str, Tuple[bytes, str, str]] = {}
+
+
+def _load_static_assets():
+    """Read every static asset into memory and precompute its ETag and media type."""
+    _static_assets.clear()
+    for path in STATIC_DIR.rglob("*"):
+        if path.is_file():
+            content = path.read_bytes()
+            etag = f'"{hashlib.sha1(content).hexdigest()}"'
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            _static_assets[path.relative_to(STATIC_DIR).as_posix()] = (content, etag, media_type)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weakly compare an If-None-Match list of entity tags against an ETag."""
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
+    _log_listener.start()
     print("Starting Chrome Extension Builder...")
+    _load_static_assets()
     yield
     # Shutdown
     print("Shutting down Chrome Extension Builder...")
+    _log_listener.stop()
 
 
 def create_app() -> FastAPI:
@@ -52,8 +91,22 @@ def create_app() -> FastAPI:
         lifespan=lifespan,
     )
 
-    # Mount static files
-    app.mount("/static", StaticFiles(directory="src/chrome_extension_builder/static"), name="static")
+    # Serve static files from memory with ETag revalidation
+    @app.api_route("/static/{path:path}", methods=["GET", "HEAD"], name="static")
+    async def static_file(path: str, request: Request):
+        """Serve a preloaded static asset, answering 304 when the client copy is current."""
+        asset = _static_assets.get(path)
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        
+        content, etag, media_type = asset
+        headers = {"ETag": etag, "Cache-Control": STATIC_CACHE_CONTROL}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(content))
+            return Response(media_type=media_type, headers=headers)
+        return Response(content=content, media_type=media_type, headers=headers)
 
     # Include routers
     app.include_router(api_router, prefix="/api")
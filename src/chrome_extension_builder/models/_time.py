@@ -0,0 +1,10 @@
+"""
+Timestamp helpers shared by the data models.
+"""
+
+from datetime import datetime, timezone
+
+
+def utcnow() -> datetime:
+    """Return the current time as a timezone-aware UTC datetime."""
+    return datetime.now(timezone.utc)
@@ -8,6 +8,8 @@ from enum import Enum
 from pydantic import BaseModel, Field
 import uuid
 
+from ._time import utcnow
+
 
 class EventType(str, Enum):
     """Types of browser events."""
@@ -25,9 +27,9 @@ class EventType(str, Enum):
 
 class BrowserEvent(BaseModel):
     """Represents a browser event."""
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     type: EventType = Field(..., description="Event type")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=utcnow)
     url: Optional[str] = Field(None, description="Current page URL")
     element: Optional[str] = Field(None, description="Element that triggered the event")
     data: Dict[str, Any] = Field(default_factory=dict, description="Event-specific data")
@@ -37,11 +39,11 @@ class BrowserEvent(BaseModel):
 
 class BrowserError(BaseModel):
     """Represents a browser error."""
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     type: str = Field(..., description="Error type")
     message: str = Field(..., description="Error message")
     stack_trace: Optional[str] = Field(None, description="Stack trace")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=utcnow)
     url: Optional[str] = Field(None, description="Page URL where error occurred")
     session_id: str = Field(..., description="Browser session ID")
     extension_id: Optional[str] = Field(None, description="Extension ID if relevant")
@@ -54,8 +56,8 @@ class BrowserSession(BaseModel):
     extension_id: Optional[str] = Field(None, description="Extension being tested")
     url: Optional[str] = Field(None, description="Current page URL")
     status: str = Field(default="active", description="Session status")
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
     events: List[BrowserEvent] = Field(default_factory=list, description="Session events")
     errors: List[BrowserError] = Field(default_factory=list, description="Session errors")
     console_logs: List[str] = Field(default_factory=list, description="Console logs")
@@ -67,8 +69,8 @@ class DebugSession(BaseModel):
     id: str = Field(..., description="Unique debug session ID")
     browser_session_id: str = Field(..., description="Associated browser session")
     extension_id: str = Field(..., description="Extension being debugged")
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
     log_file_path: Optional[str] = Field(None, description="Path to log file")
     events_count: int = Field(default=0, description="Number of events logged")
     errors_count: int = Field(default=0, description="Number of errors logged")
@@ -83,4 +85,4 @@ class LogAnalysis(BaseModel):
     user_actions: List[BrowserEvent] = Field(default_factory=list, description="User actions")
     console_output: List[str] = Field(default_factory=list, description="Console output")
     recommendations: List[str] = Field(default_factory=list, description="AI recommendations")
-    timestamp: datetime = Field(default_factory=datetime.utcnow) 
\ No newline at end of file
+    timestamp: datetime = Field(default_factory=utcnow) 
\ No newline at end of file
@@ -8,6 +8,8 @@ from enum import Enum
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
+from ._time import utcnow
+
 
 class MessageRole(str, Enum):
     """Message roles in chat."""
@@ -18,10 +20,10 @@ class MessageRole(str, Enum):
 
 class ChatMessage(BaseModel):
     """Represents a single chat message."""
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()), description="Unique message ID")
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex, description="Unique message ID")
     role: MessageRole = Field(..., description="Message role")
     content: str = Field(..., description="Message content")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=utcnow)
     session_id: Optional[str] = Field(None, description="Session ID this message belongs to")
 
 
@@ -31,6 +33,6 @@ class ChatSession(BaseModel):
     user_id: Optional[str] = Field(None, description="User ID")
     title: str = Field(default="New Chat", description="Session title")
     messages: List[ChatMessage] = Field(default_factory=list)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
     extension_id: Optional[str] = Field(None, description="Associated extension ID") 
\ No newline at end of file
@@ -4,7 +4,9 @@ Extension-related data models.
 
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
+
+from ._time import utcnow
 
 
 class ExtensionManifest(BaseModel):
@@ -28,7 +30,14 @@ class Extension(BaseModel):
     description: str = Field(..., description="Extension description")
     manifest: ExtensionManifest = Field(..., description="Extension manifest")
     files: Dict[str, str] = Field(default_factory=dict, description="Extension files")
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
     session_id: Optional[str] = Field(None, description="Associated chat session ID")
-    status: str = Field(default="draft", description="Extension status") 
\ No newline at end of file
+    status: str = Field(default="draft", description="Extension status")
+    
+    @computed_field
+    @property
+    def version(self) -> str:
+        """Extension version taken from the manifest."""
+        return self.manifest.version if self.manifest else "1.0.0"
+ 
\ No newline at end of file
@@ -10,6 +10,8 @@ class ChromeExtensionBuilder {
         this.openTabs = [];
         this.activeTab = null;
         this.editorModels = new Map();
+        this.streamingMessage = null;
+        this.streamingText = '';
         
         this.init();
     }
@@ -103,10 +105,13 @@ class ChromeExtensionBuilder {
         console.log('WebSocket message received:', data);
         
         if (data.type === 'message') {
-            this.addMessage(data.content, 'assistant');
+            this.finishStreamingMessage(data.content);
             
             if (data.action === 'extension_generated' && data.extension) {
                 console.log('Extension received:', data.extension);
+                
+                // File bodies arrive as a manifest and are fetched when opened
+                data.extension.files = this.filesFromManifest(data.extension.files);
                 console.log('Extension files:', data.extension.files);
                 
                 // Show extension info
@@ -142,7 +147,42 @@ class ChromeExtensionBuilder {
             }
         } else if (data.type === 'cli_output') {
             this.addCliOutput(data.content, data.stream);
+        } else if (data.type === 'cli_output_batch') {
+            data.entries.forEach(entry => this.addCliOutput(entry.content, entry.stream));
+        } else if (data.type === 'chat_token') {
+            this.appendStreamingToken(data.content);
+        } else if (data.type === 'assistant_start') {
+            this.appendStreamingToken(`Extension "${data.name}" is ready.<br>`);
+        } else if (data.type === 'files') {
+            this.appendStreamingToken(`Files: ${data.names.join(', ')}<br>`);
+        } else if (data.type === 'assistant_end') {
+            // The full reply follows in the 'message' frame and replaces this preview
+        }
+    }
+    
+    appendStreamingToken(token) {
+        const messagesContainer = document.getElementById('chat-messages');
+        
+        if (!this.streamingMessage) {
+            this.addMessage('', 'assistant');
+            this.streamingMessage = messagesContainer.lastElementChild;
+            this.streamingText = '';
+        }
+        
+        this.streamingText += token;
+        this.streamingMessage.innerHTML = `<i class="fas fa-robot mr-2"></i> ${this.streamingText}`;
+        messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    }
+    
+    finishStreamingMessage(content) {
+        if (!this.streamingMessage) {
+            this.addMessage(content, 'assistant');
+            return;
         }
+        
+        this.streamingMessage.innerHTML = `<i class="fas fa-robot mr-2"></i> ${content}`;
+        this.streamingMessage = null;
+        this.streamingText = '';
     }
     
     addMessage(content, type) {
@@ -246,10 +286,32 @@ class ChromeExtensionBuilder {
         console.log('File tree updated successfully');
     }
     
+    filesFromManifest(files) {
+        if (!Array.isArray(files)) return files;
+        return Object.fromEntries(files.map(file => [file.name, null]));
+    }
+    
+    async fetchFileContent(filename) {
+        try {
+            // Encode each path segment so characters like '#' and '?' stay part of the name
+            const path = filename.split('/').map(encodeURIComponent).join('/');
+            const response = await fetch(`/api/extensions/${encodeURIComponent(this.currentExtensionId)}/files/${path}`);
+            return response.ok ? await response.text() : '';
+        } catch (error) {
+            console.error('Error fetching file:', error);
+            return '';
+        }
+    }
+    
     createFileItem(filename, content, container) {
         const fileItem = document.createElement('div');
         fileItem.className = 'file-item';
-        fileItem.onclick = () => this.openFileInTab(filename, content);
+        fileItem.onclick = async () => {
+            if (content === null) {
+                content = await this.fetchFileContent(filename);
+            }
+            this.openFileInTab(filename, content);
+        };
         
         const icon = this.getFileIcon(filename);
         const iconClass = this.getFileIconClass(filename);